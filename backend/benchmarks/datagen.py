@@ -0,0 +1,134 @@
+# Synthetic history: employees x years of weekday attendance with breaks, plus
+# leave requests in every status. Used by benchmarks/query_scale.py, or on its
+# own to fill a scratch database. Run from backend/:
+#
+#   python benchmarks/datagen.py --database-url sqlite:///scratch.db --employees 200 --years 3
+#
+# Rows are written with explicit ids in large multi-row INSERTs; the target
+# tables are expected to be empty.
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BATCH_SIZE = 5000
+PRESENT_RATE = 0.92
+LEAVES_PER_YEAR = 8
+
+def _insert_batches(conn, table, rows):
+    from sqlalchemy import insert
+    for i in range(0, len(rows), BATCH_SIZE):
+        conn.execute(insert(table), rows[i:i + BATCH_SIZE])
+
+def _reset_sequences(conn, tables):
+    # Explicit ids leave Postgres sequences behind; move them past the data
+    from sqlalchemy import text
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+def generate(engine, employees: int, years: float, seed: int = 1, end: date = None, password_hash: str = "x"):
+    # Returns {table: rows written}
+    from models.attendance import Attendance
+    from models.breaks import Break
+    from models.leave import LeaveRequest, LeaveStatus, LeaveType
+    from models.user import User
+
+    rng = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=int(365 * years))
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    weekdays = [d for d in days if d.weekday() < 5]
+
+    users = [
+        {"id": i, "name": f"Employee {i}", "email": f"employee{i}@bench.example",
+         "hashed_password": password_hash, "role": "admin" if i == 1 else "user", "token_version": 0,
+         "casual_leave_balance": 12, "sick_leave_balance": 8, "wfh_balance": 10}
+        for i in range(1, employees + 1)
+    ]
+    counts = {"users": len(users), "attendance": 0, "breaks": 0, "leave_requests": 0}
+    attendance_id = break_id = leave_id = 0
+    with engine.begin() as conn:
+        _insert_batches(conn, User, users)
+        attendance, breaks, leaves = [], [], []
+        for user in users:
+            for _ in range(int(LEAVES_PER_YEAR * years)):
+                leave_start = rng.choice(days)
+                leave_id += 1
+                leaves.append({
+                    "id": leave_id, "employee_id": user["id"],
+                    "leave_type": rng.choice(list(LeaveType)),
+                    "start_date": leave_start,
+                    "end_date": leave_start + timedelta(days=rng.choice((0, 0, 1, 2, 4))),
+                    "reason": "synthetic",
+                    "status": rng.choices(list(LeaveStatus), weights=(1, 8, 1))[0],
+                    "applied_at": datetime.combine(leave_start - timedelta(days=rng.randint(1, 30)), time(10)),
+                })
+            for day in weekdays:
+                if rng.random() > PRESENT_RATE:
+                    continue
+                clock_in = datetime.combine(day, time(9)) + timedelta(minutes=rng.gauss(0, 30))
+                clock_out = clock_in + timedelta(hours=rng.uniform(7.5, 9.5))
+                # Today's row stays open, as it would mid-morning
+                attendance_id += 1
+                attendance.append({
+                    "id": attendance_id, "employee_id": user["id"], "date": day,
+                    "start_time": clock_in, "end_time": None if day == end else clock_out,
+                    "work_summary": "synthetic",
+                })
+                break_start = clock_in + timedelta(hours=rng.uniform(2.5, 4))
+                for _ in range(rng.choice((1, 1, 2))):
+                    break_id += 1
+                    break_end = break_start + timedelta(minutes=rng.uniform(10, 45))
+                    breaks.append({"id": break_id, "attendance_id": attendance_id,
+                                   "break_in": break_start, "break_out": break_end})
+                    break_start = break_end + timedelta(hours=rng.uniform(1, 2))
+            if len(attendance) >= BATCH_SIZE:
+                _insert_batches(conn, Attendance, attendance)
+                _insert_batches(conn, Break, breaks)
+                counts["attendance"] += len(attendance)
+                counts["breaks"] += len(breaks)
+                attendance, breaks = [], []
+        _insert_batches(conn, Attendance, attendance)
+        _insert_batches(conn, Break, breaks)
+        _insert_batches(conn, LeaveRequest, leaves)
+        counts["attendance"] += len(attendance)
+        counts["breaks"] += len(breaks)
+        counts["leave_requests"] = len(leaves)
+        _reset_sequences(conn, ("users", "attendance", "breaks", "leave_requests"))
+    return counts
+
+def analyze(engine):
+    # Refresh planner statistics so EXPLAIN reflects the new data volume
+    from sqlalchemy import text
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a scratch database with synthetic attendance history")
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--employees", type=int, default=50)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["POSTGRES_URL"] = args.database_url
+    os.environ["DB_ASYNC"] = "0"
+    sys.path.insert(0, BACKEND_DIR)
+    from core.bootstrap import bootstrap
+    from core.database import SessionLocal, engine
+    from utils.rollups import rebuild_rollups
+
+    bootstrap(engine)
+    print(generate(engine, args.employees, args.years, seed=args.seed))
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_rollups(session)} rollup rows")
+    finally:
+        session.close()
+    analyze(engine)
@@ -0,0 +1,206 @@
+# Data-scale regression benchmark for the history-dependent queries. For each
+# scale (default 1x, 10x, 100x the base employee count) it rebuilds a scratch
+# database with benchmarks/datagen.py, times the route functions directly, and
+# EXPLAINs every statement they ran, flagging full scans of the hot tables.
+# Run from backend/:
+#
+#   python benchmarks/query_scale.py                          # temporary SQLite file
+#   python benchmarks/query_scale.py --database-url postgresql://.../scratch --fail-on-seq-scan
+#
+# The target database is dropped and recreated for every scale.
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOT_TABLES = {"attendance", "breaks", "leave_requests", "attendance_rollups", "users"}
+
+def configure_environment(database_url):
+    # Must run before app modules are imported. The sync stack is used so the
+    # captured statements can be replayed under EXPLAIN on the same driver.
+    if not database_url:
+        path = os.path.join(tempfile.mkdtemp(prefix="attendance-bench-"), "bench.db")
+        database_url = f"sqlite:///{path}"
+    os.environ["POSTGRES_URL"] = database_url
+    os.environ["DB_ASYNC"] = "0"
+    os.environ.pop("READ_POSTGRES_URL", None)
+    os.environ.setdefault("SECRET_KEY", "bench-secret")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Time the queries, not the response cache
+    os.environ["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+    sys.path.insert(0, BACKEND_DIR)
+
+class StatementCapture:
+    # Records the SELECT/UPDATE/DELETE statements the engine runs while active
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.active = False
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not executemany and statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            self.statements.append((statement, parameters))
+
+def explain(engine, statement, parameters):
+    # (plan text, [hot tables read with a full scan])
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        if engine.dialect.name == "postgresql":
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scans = []
+
+            def walk(node):
+                if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+                    scans.append(node["Relation Name"])
+                for child in node.get("Plans", ()):
+                    walk(child)
+
+            walk(plan[0]["Plan"])
+            return json.dumps(plan[0]["Plan"], indent=1), scans
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        details = [row[3] for row in cursor.fetchall()]
+        scans = []
+        for detail in details:
+            words = detail.split()
+            # "SCAN attendance" is a full table scan; "SCAN ... USING INDEX" and "SEARCH" are not
+            if len(words) >= 2 and words[0] == "SCAN" and "USING" not in words and words[1] in HOT_TABLES:
+                scans.append(words[1])
+        return "\n".join(details), scans
+    finally:
+        raw.close()
+
+def build_cases(employee_id, month_day, leave_day):
+    from core.database import SessionLocal, ThreadedSession, ThreadedSessionLocal
+    from routers.admin import monitor_attendance
+    from routers.attendance import attendance_summary
+    from routers.calendar import get_calendar_view
+    from routers.leave import apply_leave
+    from schemas.leave import LeaveRequestCreate, LeaveType
+    from starlette.requests import Request
+    from utils.jwt_token import TokenUser
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    user = TokenUser({"uid": employee_id, "sub": f"employee{employee_id}@bench.example", "role": "admin", "name": "bench", "ver": 0})
+
+    async def with_async_db(fn):
+        db = ThreadedSession(ThreadedSessionLocal())
+        try:
+            return await fn(db)
+        finally:
+            await db.close()
+
+    def calendar():
+        return asyncio.run(with_async_db(lambda db: get_calendar_view(
+            request=request, month=month_day.month, year=month_day.year, db=db, current_user=user)))
+
+    def summary():
+        return asyncio.run(with_async_db(lambda db: attendance_summary(request=request, db=db, current_user=user)))
+
+    def leave_apply():
+        # SQL overlap check (the index is not loaded here) plus the insert it guards
+        leave = LeaveRequestCreate(leave_type=LeaveType.WFH, start_date=leave_day, end_date=leave_day, reason="benchmark")
+        return asyncio.run(with_async_db(lambda db: apply_leave(request=leave, db=db, current_user=user)))
+
+    def monitor():
+        db = SessionLocal()
+        try:
+            return monitor_attendance(date=month_day.isoformat(), db=db, current_user=user)
+        finally:
+            db.close()
+
+    return {
+        "calendar.get_calendar_view": calendar,
+        "attendance.attendance_summary": summary,
+        "leave.apply_leave": leave_apply,
+        "admin.monitor_attendance": monitor,
+    }
+
+def run_scale(engine, capture, employees, years, iterations, seed):
+    from sqlalchemy import delete
+    import datagen
+    from core.bootstrap import bootstrap
+    from core.database import Base, SessionLocal
+    from models.leave import LeaveRequest
+    from utils.rollups import rebuild_rollups
+
+    Base.metadata.drop_all(bind=engine)
+    bootstrap(engine)
+    counts = datagen.generate(engine, employees, years, seed=seed)
+    session = SessionLocal()
+    try:
+        rebuild_rollups(session)
+    finally:
+        session.close()
+    datagen.analyze(engine)
+
+    today = date.today()
+    month_day = today.replace(day=1) - timedelta(days=1)
+    month_day = month_day - timedelta(days=max(month_day.weekday() - 4, 0))  # a past weekday
+    results = {}
+    for name, case in build_cases(employees // 2 or 1, month_day, today + timedelta(days=400)).items():
+        capture.statements = []
+        capture.active = True
+        case()  # warm-up run, also captures the statements
+        capture.active = False
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            case()
+            timings.append(time.perf_counter() - started)
+        plans = [(statement, *explain(engine, statement, parameters)) for statement, parameters in capture.statements]
+        results[name] = {"median_ms": statistics.median(timings) * 1000, "plans": plans}
+    with engine.begin() as conn:
+        conn.execute(delete(LeaveRequest).where(LeaveRequest.reason == "benchmark"))
+    return counts, results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time history-dependent queries at growing data scale")
+    parser.add_argument("--database-url", help="scratch database, dropped per scale (default: temporary SQLite file)")
+    parser.add_argument("--employees", type=int, default=10, help="employees at 1x")
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--scales", default="1,10,100")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--show-plans", action="store_true")
+    parser.add_argument("--fail-on-seq-scan", action="store_true", help="exit 1 when a hot table is fully scanned")
+    args = parser.parse_args()
+
+    configure_environment(args.database_url)
+    from core.database import engine
+    capture = StatementCapture(engine)
+
+    scales = [int(s) for s in args.scales.split(",")]
+    timings = {}  # case -> {scale: ms}
+    flagged = []
+    for scale in scales:
+        counts, results = run_scale(engine, capture, args.employees * scale, args.years, args.iterations, args.seed)
+        print(f"\n{scale}x: " + ", ".join(f"{n} {t}" for t, n in counts.items()))
+        for name, result in results.items():
+            timings.setdefault(name, {})[scale] = result["median_ms"]
+            for statement, plan, scans in result["plans"]:
+                if scans:
+                    flagged.append((scale, name, sorted(set(scans)), statement))
+                if args.show_plans or scans:
+                    print(f"  {name}{'  FULL SCAN: ' + ', '.join(sorted(set(scans))) if scans else ''}")
+                    print("    " + " ".join(statement.split()))
+                    print("    " + plan.replace("\n", "\n    "))
+
+    print(f"\n{'query':<32}" + "".join(f"{str(s) + 'x ms':>12}" for s in scales) + f"{'growth':>10}")
+    for name, per_scale in timings.items():
+        growth = per_scale[scales[-1]] / per_scale[scales[0]] if per_scale[scales[0]] else 0.0
+        print(f"{name:<32}" + "".join(f"{per_scale[s]:>12.2f}" for s in scales) + f"{growth:>9.1f}x")
+    if flagged:
+        print(f"\n{len(flagged)} statement(s) fully scan a hot table:")
+        for scale, name, tables, statement in flagged:
+            print(f"  {scale}x {name}: {', '.join(tables)}")
+    sys.exit(1 if flagged and args.fail_on_seq_scan else 0)
@@ -0,0 +1,73 @@
+# Worker startup benchmark: how long a fresh interpreter takes to import the
+# app and finish its startup hooks, i.e. the delay before a new worker can
+# serve. Run from backend/:
+#
+#   python benchmarks/startup.py [--runs 10] [--importtime]
+#
+# --importtime also prints the slowest imports of one run (python -X importtime).
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports main and runs the startup/shutdown hooks the way uvicorn would
+WORKER_SCRIPT = """
+import asyncio, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+async def lifecycle():
+    await main.app.router.startup()
+    ready = time.perf_counter()
+    await main.app.router.shutdown()
+    return ready
+ready = asyncio.run(lifecycle())
+print(f"{imported - started:.6f} {ready - started:.6f}")
+"""
+
+def run_once():
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout.strip().splitlines()[-1]
+    total = time.perf_counter() - started
+    import_seconds, ready_seconds = (float(v) for v in out.split())
+    return total, import_seconds, ready_seconds
+
+def slowest_imports(limit: int = 15):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def summarize(label: str, values):
+    ms = sorted(v * 1000 for v in values)
+    print(f"{label:<22} median {statistics.median(ms):8.1f} ms   min {ms[0]:8.1f} ms   max {ms[-1]:8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker startup time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    print(f"{args.runs} cold starts")
+    summarize("process (incl. exit)", [r[0] for r in runs])
+    summarize("import main", [r[1] for r in runs])
+    summarize("ready to serve", [r[2] for r in runs])
+    if args.importtime:
+        print("\nslowest imports (cumulative):")
+        for micros, name in slowest_imports():
+            print(f"{micros / 1000:8.1f} ms  {name}")
@@ -0,0 +1,153 @@
+# Schema bootstrap, run once per deploy before the workers start:
+#
+#   python -m core.bootstrap            create missing tables and indexes
+#   python -m core.bootstrap --check    report what is missing, change nothing
+#   python -m core.bootstrap --merge-duplicate-attendance
+#                                       also fold duplicate attendance days first
+#
+# create_all only adds whole tables, so indexes declared on existing tables are
+# created here as well. Missing columns that are nullable or have a server
+# default (e.g. users.token_version) are added with ALTER TABLE; any other
+# missing column is reported and must be added by hand.
+#
+# Users without starting balances in the leave ledger get backfilled "opening"
+# entries, so the ledger sums to the balance columns.
+#
+# A unique index is only created once the table holds no duplicate keys;
+# otherwise the conflicting keys are reported and the index is skipped.
+import argparse
+import logging
+import sys
+from sqlalchemy import inspect, text, select, update, delete, func
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+from core.database import Base, engine
+import models  # noqa: F401  (register all mappers)
+
+logger = logging.getLogger(__name__)
+
+def missing_schema(bind):
+    # (tables, {table: [columns]}, [indexes]) declared in the models but absent from the database
+    inspector = inspect(bind)
+    existing = set(inspector.get_table_names())
+    tables, columns, indexes = [], {}, []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing:
+            tables.append(table)
+            continue
+        present = {c["name"] for c in inspector.get_columns(table.name)}
+        absent = [c.name for c in table.columns if c.name not in present]
+        if absent:
+            columns[table.name] = absent
+        index_names = {i["name"] for i in inspector.get_indexes(table.name)}
+        indexes.extend(i for i in table.indexes if i.name not in index_names)
+    return tables, columns, indexes
+
+def addable(column) -> bool:
+    # Existing rows get NULL or the server default, so ADD COLUMN cannot fail on them
+    return column.nullable or column.server_default is not None
+
+def add_column(bind, column):
+    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+    with bind.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {ddl}"))
+
+def duplicate_keys(bind, index, limit: int = 20):
+    # Key values that occur more than once among the columns of a unique index
+    columns = list(index.columns)
+    with bind.connect() as conn:
+        return conn.execute(
+            select(*columns, func.count()).group_by(*columns).having(func.count() > 1).limit(limit)
+        ).all()
+
+def merge_duplicate_attendance(bind) -> int:
+    # Folds duplicate (employee_id, date) attendance rows, left by the old
+    # non-atomic start route, into the oldest row of each day: breaks and clock
+    # events move over, the day spans the earliest start and the latest end.
+    # Returns the number of rows removed.
+    from models.attendance import Attendance
+    from models.breaks import Break
+    from models.clock_event import ClockEvent
+    from utils.rollups import rebuild_rollups
+
+    removed = 0
+    with Session(bind) as db:
+        groups = db.execute(select(Attendance.employee_id, Attendance.date).group_by(
+            Attendance.employee_id, Attendance.date,
+        ).having(func.count() > 1)).all()
+        for employee_id, day in groups:
+            rows = db.execute(select(Attendance).filter_by(employee_id=employee_id, date=day).order_by(Attendance.id)).scalars().all()
+            keep, extra = rows[0], rows[1:]
+            keep.start_time = min((r.start_time for r in rows if r.start_time), default=None)
+            keep.end_time = max((r.end_time for r in rows if r.end_time), default=None)
+            keep.work_summary = next((r.work_summary for r in rows if r.work_summary), None)
+            extra_ids = [r.id for r in extra]
+            db.execute(update(Break).where(Break.attendance_id.in_(extra_ids)).values(attendance_id=keep.id))
+            db.execute(update(ClockEvent).where(ClockEvent.attendance_id.in_(extra_ids)).values(attendance_id=keep.id))
+            for row in extra:
+                db.expunge(row)
+            db.execute(delete(Attendance).where(Attendance.id.in_(extra_ids)))
+            removed += len(extra_ids)
+        db.commit()
+        if removed:
+            # Day counts and worked time in the rollups included the duplicates
+            rebuild_rollups(db)
+    return removed
+
+def bootstrap(bind, check_only: bool = False, merge_duplicates: bool = False):
+    tables, columns, indexes = missing_schema(bind)
+    for table in tables:
+        logger.info("Missing table %s", table.name)
+    for index in indexes:
+        logger.info("Missing index %s on %s", index.name, index.table.name)
+    manual = {}
+    for table_name, names in columns.items():
+        table = Base.metadata.tables[table_name]
+        logger.info("Missing columns %s on %s", ", ".join(names), table_name)
+        unaddable = [n for n in names if not addable(table.c[n])]
+        if unaddable:
+            manual[table_name] = unaddable
+            logger.warning("Table %s lacks columns %s without a server default; add them manually",
+                           table_name, ", ".join(unaddable))
+    if merge_duplicates and not check_only:
+        merged = merge_duplicate_attendance(bind)
+        if merged:
+            logger.warning("Merged %d duplicate attendance rows", merged)
+    blocked = []
+    for index in indexes:
+        # Columns still to be added hold no values yet
+        if index.unique and not set(c.name for c in index.columns) & set(columns.get(index.table.name, ())):
+            duplicates = duplicate_keys(bind, index)
+            if duplicates:
+                blocked.append(index)
+                logger.error("Unique index %s on %s cannot be created; duplicate keys include %s",
+                             index.name, index.table.name, ", ".join(str(tuple(d[:-1])) for d in duplicates))
+    if blocked and any(i.table.name == "attendance" for i in blocked):
+        logger.error("Run python -m core.bootstrap --merge-duplicate-attendance to fold duplicate attendance days")
+    if check_only:
+        return not (tables or columns or indexes)
+    Base.metadata.create_all(bind=bind, tables=tables)
+    for table_name, names in columns.items():
+        for name in names:
+            column = Base.metadata.tables[table_name].c[name]
+            if addable(column):
+                add_column(bind, column)
+    for index in indexes:
+        if index not in blocked:
+            index.create(bind=bind, checkfirst=True)
+    if "users" not in manual:
+        from utils.leave_review import seed_opening_balances
+        with Session(bind) as db:
+            seeded = seed_opening_balances(db)
+        if seeded:
+            logger.info("Seeded opening leave balances for %d users", seeded)
+    return not (manual or blocked)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create missing tables, columns and indexes")
+    parser.add_argument("--check", action="store_true", help="only report missing schema")
+    parser.add_argument("--merge-duplicate-attendance", action="store_true",
+                        help="fold duplicate (employee_id, date) attendance rows before indexing")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    sys.exit(0 if bootstrap(engine, check_only=args.check, merge_duplicates=args.merge_duplicate_attendance) else 1)
@@ -1,19 +1,148 @@
 # app/core/database.py
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+import logging
 import os
+import time
 from dotenv import load_dotenv
-from contextlib import contextmanager
+from contextlib import asynccontextmanager
+from core.query_stats import TimedQueuePool, TimedAsyncQueuePool
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 SQLALCHEMY_DATABASE_URL = os.getenv("POSTGRES_URL")
+# Optional read-only replica for GET reporting routes (get_read_db); unset means the primary
+READ_DATABASE_URL = os.getenv("READ_POSTGRES_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool settings, applied to every non-SQLite engine
+POOL_SIZE = int(os.getenv("POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("POOL_PRE_PING", "1") == "1"
+# After a failed replica connection, reads go to the primary for this long
+READ_REPLICA_RETRY_SECONDS = int(os.getenv("READ_REPLICA_RETRY_SECONDS", "30"))
+
+# DB_ASYNC=1 serves the async routers (attendance, leave, calendar) from an
+# asyncpg/aiosqlite engine; otherwise they run the blocking engine in the threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+def _async_url(url):
+    # Map a sync driver URL to its async driver equivalent
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+def _pool_kwargs(url, poolclass):
+    # Time connection checkouts (see core.query_stats); SQLite keeps its own pool
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": poolclass,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_pool_kwargs(SQLALCHEMY_DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Sessions handed to async routes keep loaded attributes after commit, since
+# an expired attribute cannot be refreshed implicitly from a coroutine.
+ThreadedSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+if READ_DATABASE_URL:
+    read_engine = create_engine(READ_DATABASE_URL, **_pool_kwargs(READ_DATABASE_URL, TimedQueuePool))
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    ThreadedReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=read_engine)
+else:
+    read_engine = None
+    ReadSessionLocal = None
+    ThreadedReadSessionLocal = None
+
+if DB_ASYNC:
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_POSTGRES_URL") or _async_url(SQLALCHEMY_DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_kwargs(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+if DB_ASYNC and READ_DATABASE_URL:
+    ASYNC_READ_DATABASE_URL = os.getenv("ASYNC_READ_POSTGRES_URL") or _async_url(READ_DATABASE_URL)
+    async_read_engine = create_async_engine(ASYNC_READ_DATABASE_URL, **_pool_kwargs(ASYNC_READ_DATABASE_URL, TimedAsyncQueuePool))
+    AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_read_engine = None
+    AsyncReadSessionLocal = None
+
+class ThreadedSession:
+    # AsyncSession-compatible facade over a blocking Session. Each call runs in
+    # the threadpool, so async routes work unchanged when DB_ASYNC is off.
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def connection(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.connection, *args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def flush(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.flush, *args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def delete(self, instance):
+        return await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def commit(self):
+        return await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        return await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        return await run_in_threadpool(self.sync_session.close)
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    def get_bind(self, *args, **kwargs):
+        return self.sync_session.get_bind(*args, **kwargs)
+
+def dialect_insert(db, model):
+    # INSERT construct with ON CONFLICT support for the session's backend (Postgres or SQLite)
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
 # Add this get_db function
 def get_db():
     db = SessionLocal()
@@ -21,3 +150,98 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    # Yields an AsyncSession when DB_ASYNC is on, else a ThreadedSession with the same API
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = ThreadedSession(ThreadedSessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+# Replica routing: reads fall back to the primary when no replica is configured,
+# or for READ_REPLICA_RETRY_SECONDS after the replica refused a connection.
+_replica_down_until = 0.0
+
+def _replica_available():
+    return time.monotonic() >= _replica_down_until
+
+def _mark_replica_down(error):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + READ_REPLICA_RETRY_SECONDS
+    logger.warning("Read replica unavailable, using the primary: %s", error)
+
+def read_session():
+    # A Session on the replica when it is reachable, else on the primary. The
+    # connection is checked out here so a dead replica is detected up front.
+    if ReadSessionLocal is not None and _replica_available():
+        db = ReadSessionLocal()
+        try:
+            db.connection()
+            return db
+        except (DBAPIError, OSError) as e:
+            db.close()
+            _mark_replica_down(e)
+    return SessionLocal()
+
+def get_read_db():
+    # get_db for GET-only reporting routes; may lag the primary slightly
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def _open_async_read_session():
+    if DB_ASYNC:
+        if AsyncReadSessionLocal is not None and _replica_available():
+            db = AsyncReadSessionLocal()
+            try:
+                await db.connection()
+                return db
+            except (DBAPIError, OSError) as e:
+                await db.close()
+                _mark_replica_down(e)
+        return AsyncSessionLocal()
+    if ThreadedReadSessionLocal is not None and _replica_available():
+        db = ThreadedSession(ThreadedReadSessionLocal())
+        try:
+            await db.connection()
+            return db
+        except (DBAPIError, OSError) as e:
+            await db.close()
+            _mark_replica_down(e)
+    return ThreadedSession(ThreadedSessionLocal())
+
+def is_replica_session(db) -> bool:
+    # True when db (sync, async or threaded) reads from the replica rather than the primary
+    bind = db.get_bind()
+    return (
+        (read_engine is not None and bind is read_engine)
+        or (async_read_engine is not None and bind is async_read_engine.sync_engine)
+    )
+
+async def get_async_read_db():
+    # get_async_db for GET-only reporting routes, routed like get_read_db
+    db = await _open_async_read_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+@asynccontextmanager
+async def async_session_scope():
+    # get_async_db for code running outside a request (startup, background tasks)
+    async for db in get_async_db():
+        yield db
+
+@asynccontextmanager
+async def async_read_session_scope():
+    # get_async_read_db as a context manager, for handlers that must release the
+    # connection before their response finishes (e.g. long-lived streams)
+    async for db in get_async_read_db():
+        yield db
@@ -0,0 +1,113 @@
+# Structured logging that never blocks a request on output. Handlers only put
+# records on an in-memory queue; a QueueListener thread formats them as JSON
+# lines and writes them to stdout.
+#
+# LOG_LEVEL    root level (default INFO)
+# LOG_LEVELS   per-logger levels, e.g. "utils.jwt_token=DEBUG,sqlalchemy.engine=WARNING"
+# LOG_SAMPLE   per-logger keep rates below WARNING, e.g. "routers.attendance=0.1"
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+def _parse_pairs(value: str):
+    pairs = {}
+    for part in value.split(","):
+        name, sep, setting = part.partition("=")
+        if sep and name.strip():
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+LOG_LEVELS = _parse_pairs(os.getenv("LOG_LEVELS", ""))
+LOG_SAMPLE = {name: float(rate) for name, rate in _parse_pairs(os.getenv("LOG_SAMPLE", "")).items()}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        # Fields passed with extra={"fields": {...}}
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    # Keeps a fraction of each logger's records below WARNING; the most specific
+    # configured logger name wins. Warnings and errors are always kept.
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}  # logger name -> rate
+
+    def _rate(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, probe = 1.0, name
+            while probe:
+                if probe in self.rates:
+                    rate = self.rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Enqueue the record as is: message merging and JSON formatting both happen
+    # on the listener thread. Only exc_info is rendered here, so queued records
+    # do not keep traceback frames alive. Log arguments are formatted later, so
+    # pass values rather than objects that the request goes on to mutate.
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener = None
+
+def setup_logging():
+    # Idempotent; call once per process before serving requests
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(LOG_SAMPLE))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    for name, level in LOG_LEVELS.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    # Drains the queue so records logged during shutdown are written
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,130 @@
+# In-process request metrics exposed in Prometheus text format on /metrics.
+# Every update happens on the event loop thread inside MetricsMiddleware, so the
+# counters need no locks; DB time and pool waits are collected per request by
+# core.query_stats and folded in when the request finishes.
+import bisect
+import time
+from core.query_stats import current_query_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def render(self, name: str, labels: str):
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+class RouteMetrics:
+    __slots__ = ("latency", "db_time", "pool_wait", "queries", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.db_time = Histogram(DB_BUCKETS)
+        self.pool_wait = Histogram(DB_BUCKETS)
+        self.queries = 0
+        self.statuses = {}
+
+_routes = {}  # (method, route path) -> RouteMetrics
+_in_flight = 0
+
+def _route_metrics(method: str, path: str) -> RouteMetrics:
+    key = (method, path)
+    metrics = _routes.get(key)
+    if metrics is None:
+        metrics = _routes[key] = RouteMetrics()
+    return metrics
+
+class MetricsMiddleware:
+    # Pure ASGI middleware; must sit inside QueryStatsMiddleware to see DB timings
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _in_flight -= 1
+            # FastAPI stores the matched route in the scope; use its template, not the raw path
+            route = scope.get("route")
+            metrics = _route_metrics(scope["method"], getattr(route, "path", "unmatched"))
+            metrics.latency.observe(time.perf_counter() - started)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            stats = current_query_stats()
+            if stats is not None:
+                metrics.queries += stats.count
+                metrics.db_time.observe(stats.seconds)
+                metrics.pool_wait.observe(stats.pool_wait_seconds)
+
+def _labels(method: str, path: str) -> str:
+    path = path.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{path}"'
+
+def render_metrics() -> str:
+    from core.security import password_pool_stats
+
+    lines = [
+        "# HELP http_requests_in_flight Requests currently being served.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {_in_flight}",
+    ]
+    routes = sorted(_routes.items())
+    sections = (
+        ("http_request_duration_seconds", "Request latency by route.", "latency"),
+        ("db_request_duration_seconds", "Total SQL time per request by route.", "db_time"),
+        ("db_pool_wait_seconds", "Time spent waiting for a pooled connection per request.", "pool_wait"),
+    )
+    for name, help_text, attr in sections:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (method, path), metrics in routes:
+            lines.extend(getattr(metrics, attr).render(name, _labels(method, path)))
+    lines.append("# HELP db_queries_total SQL statements executed by route.")
+    lines.append("# TYPE db_queries_total counter")
+    for (method, path), metrics in routes:
+        lines.append(f"db_queries_total{{{_labels(method, path)}}} {metrics.queries}")
+    lines.append("# HELP http_responses_total Responses by route and status code.")
+    lines.append("# TYPE http_responses_total counter")
+    for (method, path), metrics in routes:
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f'http_responses_total{{{_labels(method, path)},status="{status}"}} {count}')
+    pool = password_pool_stats()
+    for key, kind in (("in_flight", "gauge"), ("waiting", "gauge"), ("completed", "counter"), ("rejected", "counter")):
+        name = f"password_pool_{key}" + ("_total" if kind == "counter" else "")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {pool[key]}")
+    return "\n".join(lines) + "\n"
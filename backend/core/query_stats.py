@@ -0,0 +1,113 @@
+# Per-request SQL statement counting and timing via SQLAlchemy engine events.
+# The counters live in a context variable, so they follow the request through
+# the threadpool (ThreadedSession) and through SQLAlchemy's async greenlets.
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from starlette.datastructures import MutableHeaders
+
+# DEBUG=1 adds X-DB-Queries / X-DB-Time-ms to every response
+DEBUG = os.getenv("DEBUG", "0") == "1"
+QUERY_COUNT_HEADER = "X-DB-Queries"
+QUERY_TIME_HEADER = "X-DB-Time-ms"
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "pool_wait_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.pool_wait_seconds = 0.0
+
+_current = contextvars.ContextVar("query_stats", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - context._query_started
+
+class _TimedCheckout:
+    # Mixin timing how long a connection checkout waits on the pool
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait_seconds += time.perf_counter() - started
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def current_query_stats():
+    return _current.get()
+
+@contextmanager
+def track_queries():
+    # Counts statements executed inside the block (including in threadpool calls it awaits)
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def assert_max_queries(budget: int):
+    # Test helper: fails when the block runs more than budget statements
+    with track_queries() as stats:
+        yield stats
+    if stats.count > budget:
+        raise QueryBudgetExceeded(f"Expected at most {budget} queries, ran {stats.count}")
+
+def assert_query_budget(response, budget: int):
+    # Test helper for TestClient/httpx responses; needs DEBUG=1 for the header
+    count = int(response.headers[QUERY_COUNT_HEADER])
+    if count > budget:
+        raise QueryBudgetExceeded(
+            f"{response.request.method} {response.request.url.path} ran {count} queries, budget is {budget}"
+        )
+
+class QueryStatsMiddleware:
+    # Pure ASGI middleware: starts a QueryStats per HTTP request and, in debug
+    # mode, reports it in the response headers
+
+    def __init__(self, app, expose_headers: bool = DEBUG):
+        self.app = app
+        self.expose_headers = expose_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_with_stats(message):
+            if self.expose_headers and message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(QUERY_COUNT_HEADER, str(stats.count))
+                headers.append(QUERY_TIME_HEADER, f"{stats.seconds * 1000:.2f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
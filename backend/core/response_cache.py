@@ -0,0 +1,74 @@
+# Per-user response cache with ETag revalidation for the read endpoints the
+# frontend re-fetches on every navigation. Entries are keyed by endpoint, user,
+# the user's cache generation and the request parameters; write endpoints call
+# invalidate_user() after committing, which bumps the generation so older
+# entries are never read again and age out of the LRU.
+#
+# ETags are a hash of the body, so they match across workers; a worker that
+# missed another worker's invalidation serves its copy for at most the TTL.
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "10000"))
+# Lifetime of data that can still change; 0 disables caching (ETags still work)
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+# Lifetime of closed periods such as past calendar months. Backdated writes
+# only invalidate the worker that handled them, so this bounds how long other
+# workers serve the old month; keep it to minutes.
+CLOSED_PERIOD_TTL_SECONDS = float(os.getenv("CLOSED_PERIOD_TTL_SECONDS", "300"))
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+class ResponseCache:
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, etag, body)
+        self._generations = {}  # user_id -> generation
+
+    def invalidate_user(self, user_id: int):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def invalidate_users(self, user_ids):
+        for user_id in set(user_ids):
+            self.invalidate_user(user_id)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def respond(self, request: Request, name: str, user_id: int, params: tuple, build,
+                      ttl: float = RESPONSE_CACHE_TTL_SECONDS) -> Response:
+        # build() is an async callable returning the JSON-able response data; it
+        # only runs on a miss. A matching If-None-Match gets a bodiless 304.
+        key = (name, user_id, self._generations.get(user_id, 0), params)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            _, etag, body = entry
+        else:
+            body = json.dumps(jsonable_encoder(await build()), separators=(",", ":")).encode()
+            etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+            if ttl > 0:
+                self._store(key, (now + ttl, etag, body))
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+response_cache = ResponseCache()
@@ -1,7 +1,8 @@
 # app/core/security.py
-from passlib.context import CryptContext
-from jose import JWTError, jwt
+from jose import jwt
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
 import os
 from dotenv import load_dotenv
 load_dotenv()
@@ -10,13 +11,86 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost; hashes made with a different cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes for hashing, hashes allowed in flight, and callers allowed to wait
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_CONCURRENCY = int(os.getenv("PASSWORD_CONCURRENCY", str(PASSWORD_WORKERS)))
+PASSWORD_MAX_QUEUE = int(os.getenv("PASSWORD_MAX_QUEUE", "500"))
+
+_pwd_context = None
+
+def get_pwd_context():
+    # passlib and its bcrypt backend load on first use, keeping them off the
+    # worker import path (they are mostly needed inside the hashing pool)
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=BCRYPT_ROUNDS,
+            bcrypt__min_rounds=BCRYPT_ROUNDS,
+            bcrypt__max_rounds=BCRYPT_ROUNDS,
+        )
+    return _pwd_context
+
+class PasswordPoolBusy(Exception):
+    # Raised when more callers are waiting for the password pool than PASSWORD_MAX_QUEUE
+    pass
+
+_executor = None
+_slots = asyncio.Semaphore(PASSWORD_CONCURRENCY)
+_pool_stats = {"in_flight": 0, "waiting": 0, "completed": 0, "rejected": 0}
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password, hashed_password):
+    # Runs in a pool worker. Returns (valid, new_hash_or_None).
+    try:
+        return get_pwd_context().verify_and_update(plain_password, hashed_password)
+    except ValueError:
+        # Empty or unrecognised hash, e.g. accounts created through Google sign-in
+        return False, None
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+    return _executor
+
+async def _run_in_pool(fn, *args):
+    if _pool_stats["waiting"] >= PASSWORD_MAX_QUEUE:
+        _pool_stats["rejected"] += 1
+        raise PasswordPoolBusy()
+    _pool_stats["waiting"] += 1
+    try:
+        await _slots.acquire()
+    finally:
+        _pool_stats["waiting"] -= 1
+    _pool_stats["in_flight"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pool_stats["in_flight"] -= 1
+        _pool_stats["completed"] += 1
+        _slots.release()
+
+async def hash_password_async(password: str):
+    return await _run_in_pool(hash_password, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an old cost
+    return await _run_in_pool(_verify_and_update, plain_password, hashed_password)
+
+def password_pool_stats():
+    # Snapshot of the password pool: in flight, waiting, completed and rejected calls
+    return dict(_pool_stats)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
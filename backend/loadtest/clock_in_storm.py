@@ -0,0 +1,224 @@
+# Morning clock-in storm: seeds N employees into a throwaway database, then
+# drives the real app in-process (httpx ASGITransport) with arrivals bunched
+# around the start of the working day. Run from backend/:
+#
+#   python loadtest/clock_in_storm.py --employees 500 --window 30
+#   python loadtest/clock_in_storm.py --json baseline.json            # save a baseline
+#   python loadtest/clock_in_storm.py --baseline baseline.json        # compare against it
+#
+# The default database is a temporary SQLite file (aiosqlite with DB_ASYNC=1);
+# pass --database-url postgresql://... to run against a scratch Postgres.
+# Every employee logs in, starts the day (sometimes double-tapping Start, which
+# must yield exactly one success), opens the calendar, takes a break, sometimes
+# applies for leave, and ends the day.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "loadtest-password"
+
+def configure_environment(args):
+    # Must run before any app module is imported: they read settings at import time
+    if args.database_url:
+        url = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="attendance-loadtest-"), "storm.db")
+        url = f"sqlite:///{path}?timeout=30"
+    os.environ["POSTGRES_URL"] = url
+    os.environ.pop("READ_POSTGRES_URL", None)
+    os.environ.setdefault("DB_ASYNC", "1")
+    os.environ.setdefault("SECRET_KEY", "loadtest-secret")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    sys.path.insert(0, BACKEND_DIR)
+    return url
+
+def seed(employees: int):
+    from sqlalchemy import insert
+    from core.bootstrap import bootstrap
+    from core.database import engine
+    from core.security import hash_password
+    from models.user import User
+
+    bootstrap(engine)
+    hashed = hash_password(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"name": f"Employee {i}", "email": f"employee{i}@loadtest.example", "hashed_password": hashed, "role": "user"}
+            for i in range(employees)
+        ])
+
+def percentile(values, q: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}  # endpoint -> [seconds]
+        self.statuses = {}   # endpoint -> {status: count}
+        self.duplicate_starts = 0
+        self.duplicate_rejected = 0
+        self.duplicate_violations = 0
+
+    async def call(self, client, endpoint: str, method: str, url: str, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = response.status_code
+        except Exception:
+            response, status = None, "exception"
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - started)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[status] = counts.get(status, 0) + 1
+        return response if status in expected else None
+
+    def report(self, elapsed: float):
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            counts = self.statuses[endpoint]
+            total = sum(counts.values())
+            errors = sum(n for status, n in counts.items() if status == "exception" or status >= 500)
+            endpoints[endpoint] = {
+                "requests": total,
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "error_rate": errors / total,
+                "statuses": {str(status): n for status, n in sorted(counts.items(), key=str)},
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "elapsed_seconds": elapsed,
+            "requests": total,
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "duplicate_starts": self.duplicate_starts,
+            "duplicate_rejected": self.duplicate_rejected,
+            "duplicate_violations": self.duplicate_violations,
+            "endpoints": endpoints,
+        }
+
+async def employee_day(client, recorder: Recorder, index: int, args, rng: random.Random):
+    # Arrivals follow a Beta(2, 5) curve over the window: a sharp early peak with a long tail
+    await asyncio.sleep(rng.betavariate(2, 5) * args.window)
+
+    def think():
+        return asyncio.sleep(rng.expovariate(1 / args.think) if args.think else 0)
+
+    response = await recorder.call(client, "POST /login", "POST", "/login", json={
+        "email": f"employee{index}@loadtest.example", "password": PASSWORD,
+    })
+    if response is None:
+        return
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    if rng.random() < args.duplicate_rate:
+        # Double-tapped Start: both race, the unique index must let exactly one through
+        recorder.duplicate_starts += 1
+        first, second = await asyncio.gather(*(
+            recorder.call(client, "POST /attendance/start", "POST", "/attendance/start",
+                          expected=(200, 400), headers=headers, json={"work_summary": "storm"})
+            for _ in range(2)
+        ))
+        ok = [r for r in (first, second) if r is not None and r.status_code == 200]
+        rejected = [r for r in (first, second) if r is not None and r.status_code == 400]
+        recorder.duplicate_rejected += len(rejected)
+        if len(ok) != 1:
+            recorder.duplicate_violations += 1
+    else:
+        await recorder.call(client, "POST /attendance/start", "POST", "/attendance/start",
+                            headers=headers, json={"work_summary": "storm"})
+
+    today = date.today()
+    await recorder.call(client, "GET /calendar/", "GET", "/calendar/", headers=headers,
+                        params={"month": today.month, "year": today.year})
+    await think()
+    await recorder.call(client, "POST /attendance/break-in", "POST", "/attendance/break-in", headers=headers)
+    await think()
+    await recorder.call(client, "POST /attendance/break-out", "POST", "/attendance/break-out", headers=headers)
+    if rng.random() < args.leave_rate:
+        start = today + timedelta(days=rng.randint(1, 60))
+        await recorder.call(client, "POST /leave/apply", "POST", "/leave/apply", headers=headers, json={
+            "leave_type": rng.choice(["CASUAL", "SICK", "WFH"]),
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=rng.randint(0, 2))).isoformat(),
+            "reason": "load test",
+        })
+    await think()
+    await recorder.call(client, "POST /attendance/end", "POST", "/attendance/end", headers=headers,
+                        json={"work_summary": "done"})
+
+async def run_storm(args):
+    import httpx
+    import main
+    from utils import google_keys
+
+    # No network during the run: Google sign-in is not part of the storm
+    google_keys.set_key_source(google_keys.StaticKeySource({}))
+    await main.app.router.startup()
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                employee_day(client, recorder, i, args, random.Random(rng.random()))
+                for i in range(args.employees)
+            ))
+            elapsed = time.perf_counter() - started
+    finally:
+        await main.app.router.shutdown()
+    return recorder.report(elapsed)
+
+def print_report(report, baseline=None):
+    print(f"{report['requests']} requests in {report['elapsed_seconds']:.1f}s "
+          f"({report['throughput_rps']:.1f} req/s)")
+    print(f"duplicate starts: {report['duplicate_starts']}, rejected: {report['duplicate_rejected']}, "
+          f"violations: {report['duplicate_violations']}")
+    header = f"{'endpoint':<28}{'reqs':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}"
+    if baseline:
+        header += f"{'p95 vs base':>13}"
+    print(header)
+    for endpoint, e in report["endpoints"].items():
+        line = (f"{endpoint:<28}{e['requests']:>7}{e['p50_ms']:>10.1f}{e['p95_ms']:>10.1f}"
+                f"{e['p99_ms']:>10.1f}{e['error_rate']:>8.1%} ")
+        base = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if base and base["p95_ms"]:
+            line += f"{(e['p95_ms'] / base['p95_ms'] - 1):>+12.0%}"
+        print(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate the morning clock-in storm")
+    parser.add_argument("--employees", type=int, default=200)
+    parser.add_argument("--window", type=float, default=20.0, help="seconds over which employees arrive")
+    parser.add_argument("--think", type=float, default=0.2, help="mean pause between an employee's actions")
+    parser.add_argument("--duplicate-rate", type=float, default=0.05, help="share of employees double-tapping Start")
+    parser.add_argument("--leave-rate", type=float, default=0.1, help="share of employees applying for leave")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--database-url", help="scratch database to seed (default: temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="compare against a report written with --json")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    seed(args.employees)
+    report = asyncio.run(run_storm(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["duplicate_violations"] else 0)
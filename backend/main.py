@@ -1,17 +1,45 @@
+import logging
 from fastapi import FastAPI
-from core.database import Base, engine
+from fastapi.responses import PlainTextResponse
+from core.database import async_session_scope
+from core.query_stats import QueryStatsMiddleware, QUERY_COUNT_HEADER, QUERY_TIME_HEADER
+from core.metrics import MetricsMiddleware, render_metrics
 from routers.auth import router as auth_router
 from routers.attendance import router as attendance_router
 from routers.leave import router as leave_router
 from routers.calendar import router as calendar_router
 from routers.admin import router as admin_router
 from routers.google_auth import router as google_auth_router
+from utils import google_keys
+from utils.leave_index import leave_index
+from utils.break_buffer import break_buffer, BREAK_BUFFER
 from fastapi.middleware.cors import CORSMiddleware
+from core.log import setup_logging, shutdown_logging
 
-Base.metadata.create_all(bind=engine)
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Schema changes are applied by `python -m core.bootstrap`, not on worker import
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def start_background_tasks():
+    # Keep Google's signing keys cached so sign-in never waits on HTTP
+    google_keys.key_source.start()
+    # Load the leave interval index in the background; until it is ready the leave routes fall back to SQL
+    leave_index.start(async_session_scope)
+    if BREAK_BUFFER:
+        break_buffer.start(async_session_scope)
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await google_keys.key_source.stop()
+    await leave_index.stop()
+    # Commit punches still waiting in the buffer before the worker exits
+    await break_buffer.stop()
+    shutdown_logging()
+
 # Enable CORS for frontend requests
 app.add_middleware(
     CORSMiddleware,
@@ -22,7 +50,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", QUERY_COUNT_HEADER, QUERY_TIME_HEADER],
 )
+# Route latency/status/DB-time metrics, inside the per-request SQL counters it reads
+app.add_middleware(MetricsMiddleware)
+# Per-request SQL statement count and time (headers only with DEBUG=1)
+app.add_middleware(QueryStatsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 app.include_router(auth_router, tags=["Auth"])
 app.include_router(attendance_router, tags=["Attendance"])
@@ -1,3 +1,8 @@
 from .user import User
 from .attendance import Attendance
-from .breaks import Break
\ No newline at end of file
+from .breaks import Break
+from .leave import LeaveRequest
+from .rollup import AttendanceRollup
+from .clock_event import ClockEvent
+from .leave_ledger import LeaveBalanceLedger
+from .archive import ArchivedMonth
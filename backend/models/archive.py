@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from core.database import Base
+from datetime import datetime
+
+class ArchivedMonth(Base):
+    __tablename__ = "archived_months"
+
+    # Manifest of months moved from attendance/breaks to the cold tier (utils.archive)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    path = Column(String, nullable=False)
+    attendance_rows = Column(Integer, nullable=False)
+    break_rows = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
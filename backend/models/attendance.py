@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, String, Date
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, String, Date, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 from core.database import Base
@@ -6,10 +6,14 @@ from .breaks import Break  # Correct relative import for Break model
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    # One row per employee per day; every "today" lookup goes through this key
+    __table_args__ = (
+        Index("ix_attendance_employee_date", "employee_id", "date", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("users.id"))
-    date = Column(Date, default=date.today)
+    date = Column(Date, default=date.today, index=True)
     start_time = Column(DateTime, nullable=True)
     end_time = Column(DateTime, nullable=True)
     break_in = Column(DateTime, nullable=True)
@@ -7,7 +7,7 @@ class Break(Base):
     __tablename__ = "breaks"
 
     id = Column(Integer, primary_key=True, index=True)
-    attendance_id = Column(Integer, ForeignKey("attendance.id"), nullable=False)
+    attendance_id = Column(Integer, ForeignKey("attendance.id"), nullable=False, index=True)
     break_in = Column(DateTime, nullable=False, default=datetime.utcnow)
     break_out = Column(DateTime, nullable=True)
 
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from core.database import Base
+from datetime import datetime
+
+class ClockEvent(Base):
+    __tablename__ = "clock_events"
+
+    # Punches uploaded by kiosks and badge readers, keyed by the device's idempotency key
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String, unique=True, index=True, nullable=False)
+    employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    event_type = Column(String, nullable=False)  # start, end, break_in, break_out
+    event_time = Column(DateTime, nullable=False)
+    status = Column(String, nullable=False)  # applied or rejected
+    detail = Column(String, nullable=True)
+    attendance_id = Column(Integer, nullable=True)
+    break_id = Column(Integer, nullable=True)
+    received_at = Column(DateTime, default=datetime.utcnow)
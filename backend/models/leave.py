@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Enum, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Date, Enum, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from core.database import Base
 from datetime import datetime
@@ -16,6 +16,11 @@ class LeaveStatus(enum.Enum):
 
 class LeaveRequest(Base):
     __tablename__ = "leave_requests"
+    # Match the keyset order (applied_at, id) used by the paginated list endpoints
+    __table_args__ = (
+        Index("ix_leave_requests_employee_applied", "employee_id", "applied_at", "id"),
+        Index("ix_leave_requests_status_applied", "status", "applied_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -24,7 +29,7 @@ class LeaveRequest(Base):
     end_date = Column(Date, nullable=False)
     reason = Column(String, nullable=True)
     status = Column(Enum(LeaveStatus), default=LeaveStatus.PENDING)
-    applied_at = Column(DateTime, default=datetime.utcnow)
+    applied_at = Column(DateTime, default=datetime.utcnow, index=True)
     reviewed_at = Column(DateTime, nullable=True)
     reviewed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
 
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, DateTime
+from core.database import Base
+from datetime import datetime
+from .leave import LeaveType
+
+class LeaveBalanceLedger(Base):
+    __tablename__ = "leave_balance_ledger"
+
+    # Append-only record of every leave balance change
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    leave_type = Column(Enum(LeaveType), nullable=False)
+    delta = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=False)
+    leave_request_id = Column(Integer, ForeignKey("leave_requests.id"), nullable=True)
+    reason = Column(String, nullable=False)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
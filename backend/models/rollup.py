@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from core.database import Base
+
+class AttendanceRollup(Base):
+    __tablename__ = "attendance_rollups"
+
+    # One row per employee per month, plus a lifetime row stored as year=0, month=0
+    employee_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+
+    total_days = Column(Integer, nullable=False, default=0)
+    present_days = Column(Integer, nullable=False, default=0)
+    leave_days = Column(Integer, nullable=False, default=0)
+    worked_seconds = Column(Integer, nullable=False, default=0)
+    break_seconds = Column(Integer, nullable=False, default=0)
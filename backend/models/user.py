@@ -11,6 +11,8 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     role = Column(String, default="user")  # Possible values: 'user', 'admin'
+    # Bumped whenever the user is changed so previously issued tokens stop working
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Relationship to Attendance model
     attendance = relationship("Attendance", back_populates="employee")
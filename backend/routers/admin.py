@@ -1,14 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import date as date_type
+import csv
+import io
+import json
+import os
 from models.user import User
 from models.attendance import Attendance
+from models.breaks import Break
+from models.archive import ArchivedMonth
+from models.clock_event import ClockEvent
+from models.leave import LeaveRequest
+from models.leave_ledger import LeaveBalanceLedger
+from models.rollup import AttendanceRollup
 from schemas.user import UserCreate, UserResponse
-from core.database import get_db
-from utils.jwt_token import get_current_user
+from core.response_cache import response_cache
+from core.database import get_db, get_async_db, get_read_db, get_async_read_db, async_read_session_scope, read_session
+from core.security import hash_password_async, PasswordPoolBusy
+from utils.jwt_token import get_current_user, get_current_user_read, get_current_user_sync, get_current_user_unpinned
+from utils.jwt_token import revoke_user_tokens
+from routers.auth import password_busy
+from utils.worked_time import worked_time, totals_by_employee
+from utils.pagination import MAX_PAGE_SIZE, decode_cursor, limit_page, page_size, paginate
+from utils import attendance_feed
+from utils.archive import archived_months_query, months_between, read_archived_days
+from utils.analytics import analytics_report, ANALYTICS_LATE_AFTER
+from utils.leave_review import balance_grants
+from utils.leave_index import leave_index
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+# Rows fetched per round trip from the server-side cursor during exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+# Widest month range one analytics request may cover
+ANALYTICS_MAX_MONTHS = int(os.getenv("ANALYTICS_MAX_MONTHS", "36"))
+# Idle interval after which the live board stream sends a keep-alive comment
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "15"))
+EXPORT_CSV_HEADER = [
+    "attendance_id", "employee_id", "date", "start_time", "end_time",
+    "work_summary", "break_id", "break_in", "break_out",
+]
+
 # Utility: Check admin
 
 def is_admin(current_user: User):
@@ -17,66 +53,132 @@ def is_admin(current_user: User):
 
 # 1. List all users
 @router.get("/users", response_model=List[UserResponse])
-def list_users(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def list_users(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    role: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
+):
     is_admin(current_user)
-    return db.query(User).all()
+    query = db.query(User)
+    if role:
+        query = query.filter(User.role == role)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        query = query.filter(User.id > after_id)
+    limit = page_size(limit, cursor)
+    users = limit_page(query.order_by(User.id), limit).all()
+    return paginate(users, limit, response, lambda u: (u.id,))
 
 # 2. Create user
 @router.post("/users", response_model=UserResponse)
-def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     is_admin(current_user)
-    if db.query(User).filter(User.email == user.email).first():
+    if (await db.execute(select(User).where(User.email == user.email))).scalars().first():
         raise HTTPException(status_code=400, detail="Email already registered")
-    from core.security import hash_password
+    # bcrypt runs in the bounded password pool, as for signup
+    try:
+        hashed_password = await hash_password_async(user.password) if user.password else None
+    except PasswordPoolBusy:
+        raise password_busy
     new_user = User(
         name=user.name,
         email=user.email,
-        hashed_password=hash_password(user.password) if user.password else None,
+        hashed_password=hashed_password,
         role=user.role if hasattr(user, 'role') else "user"
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.flush()
+    db.add_all(balance_grants(new_user, created_by=current_user.id))
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 # 3. Edit user
 @router.put("/users/{user_id}", response_model=UserResponse)
-def edit_user(user_id: int, user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def edit_user(user_id: int, user: UserCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     is_admin(current_user)
-    db_user = db.query(User).filter(User.id == user_id).first()
+    db_user = await db.get(User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     db_user.name = user.name
     db_user.email = user.email
     db_user.role = user.role if hasattr(user, 'role') else db_user.role
-    from core.security import hash_password
     if user.password:
-        db_user.hashed_password = hash_password(user.password)
+        try:
+            db_user.hashed_password = await hash_password_async(user.password)
+        except PasswordPoolBusy:
+            raise password_busy
     # If no password provided, do not change hashed_password
-    db.commit()
-    db.refresh(db_user)
+    # Invalidate tokens issued with the old name/email/role
+    db_user.token_version = (db_user.token_version or 0) + 1
+    await db.commit()
+    await db.refresh(db_user)
+    revoke_user_tokens(db_user.id, db_user.token_version)
+    response_cache.invalidate_user(db_user.id)
     return db_user
 
 # 4. Delete user
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user_sync)):
     is_admin(current_user)
     db_user = db.query(User).filter(User.id == user_id).first()
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
+    leave_ids = delete_user_rows(db, user_id)
     db.delete(db_user)
     db.commit()
+    for leave_id in leave_ids:
+        leave_index.discard(leave_id)
+    revoke_user_tokens(user_id)
+    response_cache.invalidate_user(user_id)
     return {"msg": "User deleted"}
 
+def delete_user_rows(db: Session, user_id: int) -> list:
+    # Removes everything that references the user, in the caller's transaction,
+    # so the user row can go with foreign keys enforced. Ledger entries and
+    # reviews the user made for others keep their rows with the user cleared.
+    # Returns the ids of the user's deleted leave requests.
+    leave_ids = db.scalars(select(LeaveRequest.id).where(LeaveRequest.employee_id == user_id)).all()
+    attendance_ids = select(Attendance.id).where(Attendance.employee_id == user_id).scalar_subquery()
+    db.execute(delete(Break).where(Break.attendance_id.in_(attendance_ids)))
+    db.execute(delete(Attendance).where(Attendance.employee_id == user_id))
+    db.execute(delete(AttendanceRollup).where(AttendanceRollup.employee_id == user_id))
+    db.execute(delete(ClockEvent).where(ClockEvent.employee_id == user_id))
+    db.execute(delete(LeaveBalanceLedger).where(LeaveBalanceLedger.employee_id == user_id))
+    db.execute(update(LeaveBalanceLedger).where(LeaveBalanceLedger.created_by == user_id).values(created_by=None))
+    db.execute(update(LeaveRequest).where(LeaveRequest.reviewed_by == user_id).values(reviewed_by=None))
+    db.execute(delete(LeaveRequest).where(LeaveRequest.employee_id == user_id))
+    return leave_ids
+
 # 5. Monitor daily logs
 @router.get("/attendance")
-def monitor_attendance(date: str = Query(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def monitor_attendance(date: str = Query(...), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_user_read)):
     is_admin(current_user)
     try:
         query_date = date
         # Accept both YYYY-MM-DD and date obj
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid date format")
+    try:
+        day = date_type.fromisoformat(query_date)
+    except ValueError:
+        day = None
+    archived = db.get(ArchivedMonth, (day.year, day.month)) if day else None
+    if archived is not None:
+        return [
+            {
+                "employee_id": row["employee_id"],
+                "attendance_id": row["id"],
+                "date": row["date"],
+                "start_time": row["start_time"],
+                "end_time": row["end_time"],
+                "work_summary": row["work_summary"]
+            }
+            for row in read_archived_days(archived.path, day=day)
+        ]
     records = db.query(Attendance).filter(Attendance.date == query_date).all()
     return [
         {
@@ -90,4 +192,203 @@ def monitor_attendance(date: str = Query(...), db: Session = Depends(get_db), cu
         for rec in records
     ]
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _board_stream(subscription, snapshot, day: str):
+    # Snapshot first, then every change for the day. Events that raced the
+    # snapshot query are repeated; boards upsert rows by attendance_id.
+    try:
+        yield "retry: 3000\n\n"
+        yield _sse("snapshot", snapshot)
+        while True:
+            event = await subscription.get(FEED_HEARTBEAT_SECONDS)
+            if event is None:
+                yield ": keep-alive\n\n"
+            elif event is attendance_feed.RESYNC:
+                # Fell too far behind; the client reconnects and gets a fresh snapshot
+                yield _sse("resync", {})
+                return
+            elif event["date"] == day:
+                yield _sse(event["type"], event)
+    finally:
+        attendance_feed.broker.unsubscribe(subscription)
+
+# 5b. Live board: the day's attendance, then pushed changes (Server-Sent Events)
+@router.get("/attendance/stream")
+async def stream_attendance(
+    date: date_type = Query(...),
+    current_user: User = Depends(get_current_user_unpinned)
+):
+    # No session dependencies: those would hold a pooled connection for as long
+    # as the stream stays open
+    is_admin(current_user)
+    # Subscribe before reading the snapshot so no change falls between the two
+    subscription = attendance_feed.broker.subscribe()
+    try:
+        async with async_read_session_scope() as db:
+            records = (await db.execute(select(Attendance).filter(Attendance.date == date))).scalars().all()
+        snapshot = [
+            {
+                "employee_id": rec.employee_id,
+                "attendance_id": rec.id,
+                "date": _iso(rec.date),
+                "start_time": _iso(rec.start_time),
+                "end_time": _iso(rec.end_time),
+                "work_summary": rec.work_summary
+            }
+            for rec in records
+        ]
+    except BaseException:
+        attendance_feed.broker.unsubscribe(subscription)
+        raise
+    return StreamingResponse(
+        _board_stream(subscription, snapshot, date.isoformat()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+def _archived_partitions(path: str, start: date_type, end: date_type):
+    # Archived month as export rows (one per break, or one per breakless day), in export order
+    rows = []
+    for day in read_archived_days(path):
+        if not start <= day["date"] <= end:
+            continue
+        head = (day["id"], day["employee_id"], day["date"], day["start_time"], day["end_time"], day["work_summary"])
+        if not day["breaks"]:
+            rows.append(head + (None, None, None))
+        for brk in sorted(day["breaks"], key=lambda b: b["break_in"]):
+            rows.append(head + (brk["id"], brk["break_in"], brk["break_out"]))
+        if len(rows) >= EXPORT_BATCH_SIZE:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def _export_partitions(db, start: date_type, end: date_type):
+    # Archived months come first (they are always the oldest), then the hot tables
+    archived = db.execute(archived_months_query(months_between(start, end))).scalars().all()
+    for entry in sorted(archived, key=lambda m: (m.year, m.month)):
+        yield from _archived_partitions(entry.path, start, end)
+    stmt = select(
+        Attendance.id, Attendance.employee_id, Attendance.date, Attendance.start_time,
+        Attendance.end_time, Attendance.work_summary, Break.id, Break.break_in, Break.break_out,
+    ).outerjoin(Break, Break.attendance_id == Attendance.id).where(
+        Attendance.date >= start,
+        Attendance.date <= end,
+    ).order_by(Attendance.date, Attendance.id, Break.break_in).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    yield from db.execute(stmt).partitions()
+
+def _export_rows(start: date_type, end: date_type, fmt: str):
+    # Streams attendance joined with breaks through a server-side cursor so memory
+    # stays flat regardless of range. Uses its own session because it outlives the handler.
+    db = read_session()
+    try:
+        partitions = _export_partitions(db, start, end)
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_CSV_HEADER)
+            for rows in partitions:
+                for row in rows:
+                    writer.writerow([
+                        row[0], row[1], _iso(row[2]), _iso(row[3]), _iso(row[4]),
+                        row[5], row[6], _iso(row[7]), _iso(row[8]),
+                    ])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+            return
+
+        # NDJSON: one object per attendance with its breaks; rows arrive grouped by attendance id
+        current = None
+        for rows in partitions:
+            chunk = []
+            for row in rows:
+                if current is None or current["attendance_id"] != row[0]:
+                    if current is not None:
+                        chunk.append(json.dumps(current))
+                    current = {
+                        "attendance_id": row[0],
+                        "employee_id": row[1],
+                        "date": _iso(row[2]),
+                        "start_time": _iso(row[3]),
+                        "end_time": _iso(row[4]),
+                        "work_summary": row[5],
+                        "breaks": [],
+                    }
+                if row[6] is not None:
+                    current["breaks"].append({"id": row[6], "break_in": _iso(row[7]), "break_out": _iso(row[8])})
+            if chunk:
+                yield "\n".join(chunk) + "\n"
+        if current is not None:
+            yield json.dumps(current) + "\n"
+    finally:
+        db.close()
+
+# 6. Export attendance and breaks for payroll
+@router.get("/attendance/export")
+def export_attendance(
+    start: date_type = Query(...),
+    end: date_type = Query(...),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    current_user: User = Depends(get_current_user_unpinned)
+):
+    is_admin(current_user)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date cannot be after end date")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    filename = f"attendance_{start.isoformat()}_{end.isoformat()}.{format}"
+    return StreamingResponse(
+        _export_rows(start, end, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# 7. Net worked hours per employee over a date range
+@router.get("/hours")
+async def worked_hours(
+    start: date_type = Query(...),
+    end: date_type = Query(...),
+    employee_id: Optional[int] = None,
+    detail: bool = False,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    is_admin(current_user)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date cannot be after end date")
+    days = await worked_time(db, start, end, employee_id=employee_id)
+    result = {"employees": totals_by_employee(days)}
+    if detail:
+        result["days"] = days
+    return result
+
+# 8. HR analytics: late arrivals, start times, breaks and absence streaks per month
+@router.get("/analytics")
+async def attendance_analytics(
+    start: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    end: str = Query(..., pattern=r"^\d{4}-(0[1-9]|1[0-2])$"),
+    employee_ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    is_admin(current_user)
+    first = date_type(int(start[:4]), int(start[5:]), 1)
+    last = date_type(int(end[:4]), int(end[5:]), 1)
+    if first > last:
+        raise HTTPException(status_code=400, detail="Start month cannot be after end month")
+    months = months_between(first, last)
+    if len(months) > ANALYTICS_MAX_MONTHS:
+        raise HTTPException(status_code=400, detail=f"At most {ANALYTICS_MAX_MONTHS} months per request")
+    return {
+        "late_after": ANALYTICS_LATE_AFTER.strftime("%H:%M"),
+        "months": await analytics_report(db, months, employee_ids)
+    }
+
 # (Attendance manual edit/add endpoints will be next)
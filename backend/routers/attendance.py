@@ -1,68 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from core.database import get_db
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from core.database import get_async_db, dialect_insert
+from core.response_cache import response_cache
 from models.attendance import Attendance
 from models.breaks import Break
-from schemas.attendance_schema import AttendanceStart, AttendanceEnd
+from schemas.attendance_schema import AttendanceStart, AttendanceEnd, ClockEventBatch, ClockEventResult
 from schemas.breaks_schema import BreakSchema
-from datetime import datetime
+from datetime import datetime, date
+from typing import List
 from utils.jwt_token import get_current_user
+from utils.rollups import bump_rollup, get_rollup, span_seconds
+from utils.ingest import ingest_events, applied_feed_events
+from utils.worked_time import worked_time, totals_by_employee
+from utils.attendance_feed import attendance_event, publish
+from utils.analytics import invalidate_months
+from utils.break_buffer import break_buffer, BreakRejected
 
 router = APIRouter(prefix="/attendance")
+logger = logging.getLogger(__name__)
+
+async def get_attendance_for_day(db: AsyncSession, employee_id: int, day, *options):
+    # Served by the (employee_id, date) unique index
+    result = await db.execute(select(Attendance).filter_by(employee_id=employee_id, date=day).options(*options))
+    return result.scalars().first()
 
 # Start Day Route
 @router.post("/start")
-def start_day(data: AttendanceStart, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    today = datetime.utcnow().date()  # Get the current date in UTC
-    # Check if the user already has an attendance record for today
-    existing = db.query(Attendance).filter_by(employee_id=current_user.id, date=today).first()
-    print(f"Existing attendance: {existing}")
-    if existing:
-        raise HTTPException(status_code=400, detail="Attendance already started today.")
-    print(f"Starting attendance for {current_user.name} on {today}")
-    # Create a new attendance record
-    attendance = Attendance(
+async def start_day(data: AttendanceStart, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    now = datetime.utcnow()  # Current UTC time
+    today = now.date()
+    logger.debug("Starting attendance", extra={"fields": {"employee_id": current_user.id, "date": today}})
+    # Insert today's record; the (employee_id, date) unique index rejects a second start
+    stmt = dialect_insert(db, Attendance).values(
         employee_id=current_user.id,
-        start_time=datetime.utcnow(),  # Set to current UTC time
+        start_time=now,
         work_summary=data.work_summary,
         date=today
-    )
-    db.add(attendance)
-    db.commit()
-    db.refresh(attendance)
-    return {"msg": "Day started", "attendance_id": attendance.id, "start_time": attendance.start_time.isoformat()}
+    ).on_conflict_do_nothing(index_elements=["employee_id", "date"]).returning(Attendance.id)
+    attendance_id = (await db.execute(stmt)).scalar()
+    if attendance_id is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Attendance already started today.")
+    await bump_rollup(db, current_user.id, today, total_days=1, present_days=1,
+                      leave_days=1 if data.work_summary == "LEAVE" else 0)
+    await db.commit()
+    response_cache.invalidate_user(current_user.id)
+    await publish(attendance_event("start", current_user.id, today, attendance_id,
+                                   start_time=now, work_summary=data.work_summary))
+    return {"msg": "Day started", "attendance_id": attendance_id, "start_time": now.isoformat()}
 
 # End Day Route
 @router.post("/end")
-def end_day(data: AttendanceEnd, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def end_day(data: AttendanceEnd, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
     today = datetime.utcnow().date()
-    attendance = db.query(Attendance).filter_by(employee_id=current_user.id, date=today).first()
+    attendance = await get_attendance_for_day(db, current_user.id, today)
     if not attendance:
         raise HTTPException(status_code=404, detail="No attendance record found for today.")
-    
+
+    # Ending twice replaces the earlier end time, so roll up only the difference
+    old_seconds = span_seconds(attendance.start_time, attendance.end_time)
+    was_leave = attendance.work_summary == "LEAVE"
     # Mark the end time of the attendance record
     attendance.end_time = datetime.utcnow()
     if data.work_summary:
         attendance.work_summary = data.work_summary
-    db.commit()
+    await bump_rollup(db, current_user.id, today,
+                      worked_seconds=span_seconds(attendance.start_time, attendance.end_time) - old_seconds,
+                      leave_days=int(attendance.work_summary == "LEAVE") - int(was_leave))
+    await db.commit()
+    response_cache.invalidate_user(current_user.id)
+    await publish(attendance_event("end", current_user.id, today, attendance.id,
+                                   end_time=attendance.end_time, work_summary=attendance.work_summary))
     return {"msg": "Day ended", "start_time": attendance.start_time.isoformat() if attendance.start_time else None, "end_time": attendance.end_time.isoformat() if attendance.end_time else None}
 
 # Get Today's Attendance Route
 @router.get("/today")
-def get_today_attendance(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def get_today_attendance(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
     today = datetime.utcnow().date()
-    attendance = db.query(Attendance).filter(
-        Attendance.employee_id == current_user.id,
-        func.date(Attendance.start_time) == today
-    ).first()
+    # Breaks come from one eager selectin query rather than a lazy load
+    attendance = await get_attendance_for_day(db, current_user.id, today, selectinload(Attendance.breaks))
     if not attendance:
         return {"start_time": None, "end_time": None, "breaks": []}
-    # Get all breaks for this attendance
-    breaks = db.query(Break).filter_by(attendance_id=attendance.id).all()
     breaks_data = [
         {"id": b.id, "break_in": b.break_in.isoformat(), "break_out": b.break_out.isoformat() if b.break_out else None}
-        for b in breaks
+        for b in sorted(attendance.breaks, key=lambda b: b.break_in)
     ]
     return {
         "start_time": attendance.start_time.isoformat() if attendance.start_time else None,
@@ -72,55 +96,106 @@ def get_today_attendance(db: Session = Depends(get_db), current_user=Depends(get
 
 # Break-In Route
 @router.post("/break-in")
-def break_in(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def break_in(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    if break_buffer.running:
+        # Group commit: validated and committed together with concurrent punches
+        try:
+            punch = await break_buffer.submit("break_in", current_user.id)
+        except BreakRejected as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        await publish(attendance_event("break_in", current_user.id, punch["break_in"].date(), punch["attendance_id"],
+                                       break_id=punch["break_id"], break_in=punch["break_in"]))
+        return {"msg": "Break started", "break_id": punch["break_id"], "break_in": punch["break_in"].isoformat()}
     today = datetime.utcnow().date()
-    attendance = db.query(Attendance).filter(
-        Attendance.employee_id == current_user.id,
-        func.date(Attendance.start_time) == today
-    ).first()
+    attendance = await get_attendance_for_day(db, current_user.id, today)
     if not attendance:
-        # Try to debug why attendance is not found
-        all_today = db.query(Attendance).filter_by(date=today).all()
-        print(f"Attendance for today: {all_today}")
-        print(f"Current user ID: {current_user.id}")
+        logger.debug("Break-in without attendance", extra={"fields": {"employee_id": current_user.id, "date": today}})
         raise HTTPException(status_code=404, detail="No attendance record found for today.")
     # Create a new Break record
     new_break = Break(attendance_id=attendance.id, break_in=datetime.utcnow())
     db.add(new_break)
-    db.commit()
-    db.refresh(new_break)
+    await db.commit()
+    await db.refresh(new_break)
+    await publish(attendance_event("break_in", current_user.id, today, attendance.id,
+                                   break_id=new_break.id, break_in=new_break.break_in))
     return {"msg": "Break started", "break_id": new_break.id, "break_in": new_break.break_in.isoformat()}
 
 # Break-Out Route
 @router.post("/break-out")
-def break_out(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def break_out(db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    if break_buffer.running:
+        try:
+            punch = await break_buffer.submit("break_out", current_user.id)
+        except BreakRejected as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        response_cache.invalidate_user(current_user.id)
+        await publish(attendance_event("break_out", current_user.id, punch["break_out"].date(), punch["attendance_id"],
+                                       break_id=punch["break_id"], break_out=punch["break_out"]))
+        return {"msg": "Break ended", "break_id": punch["break_id"], "break_out": punch["break_out"].isoformat()}
     today = datetime.utcnow().date()
-    attendance = db.query(Attendance).filter(
-        Attendance.employee_id == current_user.id,
-        func.date(Attendance.start_time) == today
-    ).first()
+    attendance = await get_attendance_for_day(db, current_user.id, today)
     if not attendance:
         raise HTTPException(status_code=404, detail="No attendance record found for today.")
-    
+
     # Find the latest open break (break_out is null)
-    latest_break = db.query(Break).filter_by(attendance_id=attendance.id, break_out=None).order_by(Break.break_in.desc()).first()
+    latest_break = (await db.execute(
+        select(Break).filter_by(attendance_id=attendance.id, break_out=None).order_by(Break.break_in.desc())
+    )).scalars().first()
     if not latest_break:
         raise HTTPException(status_code=404, detail="No open break found to end.")
     latest_break.break_out = datetime.utcnow()
-    db.commit()
-    db.refresh(latest_break)
+    await bump_rollup(db, current_user.id, today,
+                      break_seconds=span_seconds(latest_break.break_in, latest_break.break_out))
+    await db.commit()
+    response_cache.invalidate_user(current_user.id)
+    await db.refresh(latest_break)
+    await publish(attendance_event("break_out", current_user.id, today, attendance.id,
+                                   break_id=latest_break.id, break_out=latest_break.break_out))
     return {"msg": "Break ended", "break_id": latest_break.id, "break_out": latest_break.break_out.isoformat()}
 
 # Attendance Summary for Dashboard
 @router.get("/summary")
-def attendance_summary(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    total = db.query(Attendance).filter_by(employee_id=current_user.id).count()
-    present = db.query(Attendance).filter_by(employee_id=current_user.id).filter(Attendance.start_time.isnot(None)).count()
-    absent = total - present
-    leaves = db.query(Attendance).filter_by(employee_id=current_user.id).filter(Attendance.work_summary == "LEAVE").count()
-    return {
-        "total": total,
-        "present": present,
-        "absent": absent,
-        "leaves": leaves
-    }
+async def attendance_summary(request: Request, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    async def build():
+        # Single primary-key read of the lifetime rollup
+        rollup = await get_rollup(db, current_user.id)
+        if rollup is None:
+            return {"total": 0, "present": 0, "absent": 0, "leaves": 0, "worked_minutes": 0, "break_minutes": 0}
+        return {
+            "total": rollup.total_days,
+            "present": rollup.present_days,
+            "absent": rollup.total_days - rollup.present_days,
+            "leaves": rollup.leave_days,
+            "worked_minutes": rollup.worked_seconds // 60,
+            "break_minutes": rollup.break_seconds // 60
+        }
+    return await response_cache.respond(request, "attendance_summary", current_user.id, (), build)
+
+# Net worked hours for the current user over a date range
+@router.get("/hours")
+async def my_worked_hours(
+    start: date = Query(...),
+    end: date = Query(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user)
+):
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date cannot be after end date")
+    days = await worked_time(db, start, end, employee_id=current_user.id)
+    totals = totals_by_employee(days)
+    return {"days": days, "total": totals[0] if totals else None}
+
+# Bulk punch upload for kiosks and badge readers
+@router.post("/ingest", response_model=List[ClockEventResult])
+async def ingest_clock_events(batch: ClockEventBatch, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    if current_user.role not in ("admin", "kiosk"):
+        raise HTTPException(status_code=403, detail="Admins or kiosks only")
+    results = await ingest_events(db, batch.events)
+    applied = applied_feed_events(batch.events, results)
+    response_cache.invalidate_users(event["employee_id"] for event in applied)
+    for event in applied:
+        # Backdated punches can land in a month whose analytics are cached
+        day = date.fromisoformat(event["date"])
+        invalidate_months(day, day)
+        await publish(event)
+    return results
@@ -1,50 +1,76 @@
 # Remove the 'app' prefix from imports
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.user import UserCreate, UserLogin, UserResponse
 from models.user import User
-from core.database import SessionLocal, get_db
-from core.security import hash_password, verify_password
-from utils.jwt_token import create_access_token, get_current_user
+from core.database import get_async_db
+from core.response_cache import response_cache
+from core.security import hash_password_async, verify_password_async, PasswordPoolBusy
+from utils.jwt_token import create_access_token, get_current_user, token_claims
+from utils.leave_review import balance_grants
 from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter()
 
+password_busy = HTTPException(status_code=503, detail="Too many logins in progress, try again shortly")
+
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    db_user = (await db.execute(select(User).where(User.email == email))).scalars().first()
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    # bcrypt runs in the password process pool so it never blocks the event loop
+    try:
+        valid, new_hash = await verify_password_async(password, db_user.hashed_password)
+    except PasswordPoolBusy:
+        raise password_busy
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        # Stored hash used a different bcrypt cost; upgrade it transparently
+        db_user.hashed_password = new_hash
+        await db.commit()
+    return db_user
+
 @router.post("/signup", response_model=UserResponse)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user.email).first()
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = (await db.execute(select(User).where(User.email == user.email))).scalars().first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    try:
+        hashed_password = await hash_password_async(user.password)
+    except PasswordPoolBusy:
+        raise password_busy
     new_user = User(
         name=user.name,
         email=user.email,
-        hashed_password=hash_password(user.password)
+        hashed_password=hashed_password
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.flush()
+    db.add_all(balance_grants(new_user))
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @router.post("/login")
-def login_json(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token(data={"sub": db_user.email})
+async def login_json(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await authenticate_user(db, user.email, user.password)
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
 @router.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == form_data.username).first()
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = create_access_token(data={"sub": db_user.email})
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    db_user = await authenticate_user(db, form_data.username, form_data.password)
+    token = create_access_token(data=token_claims(db_user))
     return {"access_token": token, "token_type": "bearer"}
 
 @router.get("/user/me")
-def get_me(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return {
-        "name": current_user.name,
-        "email": current_user.email,
-        "role": current_user.role
-    }
\ No newline at end of file
+async def get_me(request: Request, current_user=Depends(get_current_user)):
+    async def build():
+        return {
+            "name": current_user.name,
+            "email": current_user.email,
+            "role": current_user.role
+        }
+    return await response_cache.respond(request, "me", current_user.id, (), build)
\ No newline at end of file
@@ -1,21 +1,24 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import date, datetime, timedelta
-from core.database import get_db
+from core.database import get_async_read_db, is_replica_session
+from core.response_cache import response_cache, CLOSED_PERIOD_TTL_SECONDS, RESPONSE_CACHE_TTL_SECONDS
 from models.attendance import Attendance
+from models.archive import ArchivedMonth
 from models.leave import LeaveRequest, LeaveStatus
+from models.user import User
 from utils.jwt_token import get_current_user
-from typing import Dict
+from utils.archive import read_archived_days
+from typing import Dict, List, Optional
 
 router = APIRouter(prefix="/calendar", tags=["Calendar"])
 
-@router.get("/", response_model=Dict[str, str])
-def get_calendar_view(
-    month: int = Query(..., ge=1, le=12),
-    year: int = Query(..., ge=1900),
-    db: Session = Depends(get_db),
-    current_user=Depends(get_current_user)
-):
+# Single-letter day codes used by the team view
+DAY_CODES = {"present": "P", "leave": "L", "absent": "A", "weekend": "W", "future": "F"}
+
+def month_bounds(year: int, month: int):
     # Get first and last day of the month
     try:
         first_day = date(year, month, 1)
@@ -25,46 +28,157 @@ def get_calendar_view(
         last_day = date(year + 1, 1, 1) - timedelta(days=1)
     else:
         last_day = date(year, month + 1, 1) - timedelta(days=1)
+    return first_day, last_day
 
-    # 1. Attendance records for the month
-    attendance_records = db.query(Attendance).filter(
-        Attendance.employee_id == current_user.id,
-        Attendance.date >= first_day,
-        Attendance.date <= last_day
-    ).all()
-    attendance_days = set([rec.date.date() if hasattr(rec.date, 'date') else rec.date for rec in attendance_records])
+# Day sets are int bitsets: bit d stands for first_day + d days.
 
-    # 2. Approved leave requests overlapping this month
-    leave_requests = db.query(LeaveRequest).filter(
-        LeaveRequest.employee_id == current_user.id,
-        LeaveRequest.status == LeaveStatus.APPROVED,
-        LeaveRequest.end_date >= first_day,
-        LeaveRequest.start_date <= last_day
-    ).all()
-    leave_days = set()
-    for leave in leave_requests:
-        day = leave.start_date
-        while day <= leave.end_date:
-            if first_day <= day <= last_day:
-                leave_days.add(day)
-            day += timedelta(days=1)
-
-    # 3. Build calendar status
-    calendar = {}
-    today = date.today()
+def day_bit(first_day: date, day) -> int:
+    day = day.date() if isinstance(day, datetime) else day
+    return 1 << (day - first_day).days
+
+def interval_mask(first_day: date, last_day: date, start: date, end: date) -> int:
+    # Bits for the part of [start, end] that falls inside the month
+    lo = max(start, first_day)
+    hi = min(end, last_day)
+    if lo > hi:
+        return 0
+    return ((1 << ((hi - lo).days + 1)) - 1) << (lo - first_day).days
+
+def month_masks(first_day: date, last_day: date, today: date):
+    # Weekend and past-day masks are the same for every employee
+    weekend = past = 0
     for d in range((last_day - first_day).days + 1):
         day = first_day + timedelta(days=d)
-        day_str = day.isoformat()
-        if day in attendance_days:
-            calendar[day_str] = "present"
-        elif day in leave_days:
-            calendar[day_str] = "leave"
-        elif day < today:
+        if day.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
+            weekend |= 1 << d
+        if day < today:
+            past |= 1 << d
+    return weekend, past
+
+def day_statuses(num_days: int, present: int, leave: int, weekend: int, past: int) -> List[str]:
+    statuses = []
+    for d in range(num_days):
+        bit = 1 << d
+        if present & bit:
+            statuses.append("present")
+        elif leave & bit:
+            statuses.append("leave")
+        elif past & bit:
             # Skip weekends from being marked as absent
-            if day.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-                calendar[day_str] = "weekend"
-            else:
-                calendar[day_str] = "absent"
+            statuses.append("weekend" if weekend & bit else "absent")
         else:
-            calendar[day_str] = "future"
-    return calendar
+            statuses.append("future")
+    return statuses
+
+@router.get("/", response_model=Dict[str, str])
+async def get_calendar_view(
+    request: Request,
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(..., ge=1900),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user=Depends(get_current_user)
+):
+    first_day, last_day = month_bounds(year, month)
+    today = date.today()
+
+    async def build():
+        # 1. Attendance days for the month, from the cold tier once the month is archived
+        archived = await db.get(ArchivedMonth, (year, month)) if last_day < today else None
+        if archived is not None:
+            rows = await run_in_threadpool(read_archived_days, archived.path, current_user.id)
+            attendance_days = [row["date"] for row in rows]
+        else:
+            attendance_days = (await db.execute(select(Attendance.date).filter(
+                Attendance.employee_id == current_user.id,
+                Attendance.date >= first_day,
+                Attendance.date <= last_day
+            ))).scalars().all()
+        present = 0
+        for day in attendance_days:
+            present |= day_bit(first_day, day)
+
+        # 2. Approved leave requests overlapping this month
+        leave_intervals = (await db.execute(select(LeaveRequest.start_date, LeaveRequest.end_date).filter(
+            LeaveRequest.employee_id == current_user.id,
+            LeaveRequest.status == LeaveStatus.APPROVED,
+            LeaveRequest.end_date >= first_day,
+            LeaveRequest.start_date <= last_day
+        ))).all()
+        leave = 0
+        for start, end in leave_intervals:
+            leave |= interval_mask(first_day, last_day, start, end)
+
+        # 3. Build calendar status
+        num_days = (last_day - first_day).days + 1
+        weekend, past = month_masks(first_day, last_day, today)
+        statuses = day_statuses(num_days, present, leave, weekend, past)
+        return {(first_day + timedelta(days=d)).isoformat(): statuses[d] for d in range(num_days)}
+
+    # A closed month no longer depends on today's date, so it is cached for longer.
+    # A replica may still lag a backdated change that invalidated the entry, so
+    # replica-built entries only get the normal TTL.
+    if last_day < today:
+        ttl = RESPONSE_CACHE_TTL_SECONDS if is_replica_session(db) else CLOSED_PERIOD_TTL_SECONDS
+        return await response_cache.respond(request, "calendar", current_user.id, (year, month), build, ttl=ttl)
+    return await response_cache.respond(request, "calendar", current_user.id, (year, month, today), build)
+
+@router.get("/team")
+async def get_team_calendar(
+    month: int = Query(..., ge=1, le=12),
+    year: int = Query(..., ge=1900),
+    employee_ids: Optional[List[int]] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user=Depends(get_current_user)
+):
+    # Month grid for many employees: one grouped attendance query and one leave query
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admins only")
+    first_day, last_day = month_bounds(year, month)
+
+    user_query = select(User.id, User.name).order_by(User.id)
+    attendance_query = select(Attendance.employee_id, Attendance.date).filter(
+        Attendance.date >= first_day,
+        Attendance.date <= last_day
+    ).group_by(Attendance.employee_id, Attendance.date)
+    leave_query = select(LeaveRequest.employee_id, LeaveRequest.start_date, LeaveRequest.end_date).filter(
+        LeaveRequest.status == LeaveStatus.APPROVED,
+        LeaveRequest.end_date >= first_day,
+        LeaveRequest.start_date <= last_day
+    )
+    if employee_ids:
+        user_query = user_query.filter(User.id.in_(employee_ids))
+        attendance_query = attendance_query.filter(Attendance.employee_id.in_(employee_ids))
+        leave_query = leave_query.filter(LeaveRequest.employee_id.in_(employee_ids))
+
+    users = (await db.execute(user_query)).all()
+    archived = await db.get(ArchivedMonth, (year, month)) if last_day < date.today() else None
+    if archived is not None:
+        wanted = set(employee_ids) if employee_ids else None
+        rows = await run_in_threadpool(read_archived_days, archived.path)
+        attended = [(row["employee_id"], row["date"]) for row in rows if wanted is None or row["employee_id"] in wanted]
+    else:
+        attended = (await db.execute(attendance_query)).all()
+    present = {}
+    for employee_id, day in attended:
+        present[employee_id] = present.get(employee_id, 0) | day_bit(first_day, day)
+    leave = {}
+    for employee_id, start, end in (await db.execute(leave_query)).all():
+        leave[employee_id] = leave.get(employee_id, 0) | interval_mask(first_day, last_day, start, end)
+
+    num_days = (last_day - first_day).days + 1
+    weekend, past = month_masks(first_day, last_day, date.today())
+    return {
+        "start": first_day.isoformat(),
+        "days": num_days,
+        "codes": DAY_CODES,
+        "employees": [
+            {
+                "id": user_id,
+                "name": name,
+                "days": "".join(
+                    DAY_CODES[s] for s in day_statuses(num_days, present.get(user_id, 0), leave.get(user_id, 0), weekend, past)
+                ),
+            }
+            for user_id, name in users
+        ],
+    }
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import httpx
 from models import user as user_model
-from core.database import engine, Base
-from sqlalchemy.orm import Session
-from core.security import create_access_token
+from core.database import get_async_db
+from utils.jwt_token import create_access_token, token_claims
+from utils.google_keys import verify_google_token
+from utils.leave_review import balance_grants
 
 router = APIRouter()
 
@@ -13,25 +15,26 @@ class GoogleToken(BaseModel):
     token: str
 
 @router.post("/google-login")
-async def google_login(data: GoogleToken):
+async def google_login(data: GoogleToken, db: AsyncSession = Depends(get_async_db)):
     try:
-        idinfo = id_token.verify_oauth2_token(
-            data.token, requests.Request(), "853434167999-0aj5opdatd6i58n6uifanipcchfkunqd.apps.googleusercontent.com"
-        )
-        email = idinfo.get("email")
-        name = idinfo.get("name")
-        if not email:
-            raise HTTPException(status_code=400, detail="Google token missing email")
-        # Check if user exists, else create
-        db = Session(bind=engine)
-        user = db.query(user_model.User).filter_by(email=email).first()
-        if not user:
-            user = user_model.User(email=email, name=name, hashed_password="", role="user")
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        token = create_access_token({"sub": user.email})
-        db.close()
-        return {"access_token": token, "token_type": "bearer"}
+        # Verified against the cached signing keys; no HTTP call on the request path
+        idinfo = await verify_google_token(data.token)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid Google token")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=503, detail="Google sign-in is temporarily unavailable")
+    email = idinfo.get("email")
+    name = idinfo.get("name")
+    if not email:
+        raise HTTPException(status_code=400, detail="Google token missing email")
+    # Check if user exists, else create
+    user = (await db.execute(select(user_model.User).filter_by(email=email))).scalars().first()
+    if not user:
+        user = user_model.User(email=email, name=name, hashed_password="", role="user")
+        db.add(user)
+        await db.flush()
+        db.add_all(balance_grants(user))
+        await db.commit()
+        await db.refresh(user)
+    token = create_access_token(token_claims(user))
+    return {"access_token": token, "token_type": "bearer"}
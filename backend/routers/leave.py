@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import date, timedelta
-from core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from typing import List, Optional
+from datetime import date, datetime, timedelta
+from core.database import get_async_db
+from core.response_cache import response_cache
 from models.leave import LeaveRequest, LeaveType, LeaveStatus
+from models.leave_ledger import LeaveBalanceLedger
 from models.user import User
 from schemas.leave import LeaveRequestCreate, LeaveRequestResponse, LeaveBalanceResponse
+from schemas.leave import LeaveReviewRequest, LeaveReviewResult, LeaveLedgerEntry
+from schemas.leave import LeaveType as LeaveTypeFilter, LeaveStatus as LeaveStatusFilter
 from utils.jwt_token import get_current_user
+from utils.pagination import MAX_PAGE_SIZE, decode_cursor, limit_page, page_size, paginate
+from utils.leave_review import review_leaves, NOT_FOUND_DETAIL
+from utils.leave_index import leave_index, query_out_between
 
 router = APIRouter(prefix="/leave", tags=["Leave"])
 
@@ -15,18 +24,39 @@ def is_admin(current_user: User):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admins only")
 
+def filter_leave_page(query, cursor, leave_type, status, from_date, to_date):
+    # Shared filters and keyset condition for the paginated leave lists (newest first)
+    if leave_type:
+        query = query.filter(LeaveRequest.leave_type == LeaveType(leave_type.value))
+    if status:
+        query = query.filter(LeaveRequest.status == LeaveStatus(status.value))
+    if from_date:
+        query = query.filter(LeaveRequest.end_date >= from_date)
+    if to_date:
+        query = query.filter(LeaveRequest.start_date <= to_date)
+    if cursor:
+        applied_at, leave_id = decode_cursor(cursor, datetime, int)
+        query = query.filter(tuple_(LeaveRequest.applied_at, LeaveRequest.id) < (applied_at, leave_id))
+    return query.order_by(LeaveRequest.applied_at.desc(), LeaveRequest.id.desc())
+
+def leave_page_key(leave):
+    return leave.applied_at, leave.id
+
 @router.post("/apply", response_model=LeaveRequestResponse)
-def apply_leave(request: LeaveRequestCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def apply_leave(request: LeaveRequestCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     # Date validation
     if request.start_date > request.end_date:
         raise HTTPException(status_code=400, detail="Start date cannot be after end date")
-    # Overlap check
-    overlap = db.query(LeaveRequest).filter(
-        LeaveRequest.employee_id == current_user.id,
-        LeaveRequest.status == LeaveStatus.APPROVED,
-        LeaveRequest.end_date >= request.start_date,
-        LeaveRequest.start_date <= request.end_date
-    ).first()
+    # Overlap check, answered from the interval index once it is loaded
+    if leave_index.ready:
+        overlap = leave_index.overlaps(current_user.id, request.start_date, request.end_date)
+    else:
+        overlap = (await db.execute(select(LeaveRequest).filter(
+            LeaveRequest.employee_id == current_user.id,
+            LeaveRequest.status == LeaveStatus.APPROVED,
+            LeaveRequest.end_date >= request.start_date,
+            LeaveRequest.start_date <= request.end_date
+        ))).scalars().first()
     if overlap:
         raise HTTPException(status_code=400, detail="Leave overlaps with existing approved leave")
     leave = LeaveRequest(
@@ -37,24 +67,88 @@ def apply_leave(request: LeaveRequestCreate, db: Session = Depends(get_db), curr
         reason=request.reason
     )
     db.add(leave)
-    db.commit()
-    db.refresh(leave)
+    await db.commit()
+    await db.refresh(leave)
+    leave_index.put(leave)
+    response_cache.invalidate_user(current_user.id)
     return leave
 
+@router.get("/out")
+async def who_is_out(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    include_pending: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Everyone on leave at some point in [start, end] (default: today). Admins
+    # see leave types and may include pending requests; other users only get
+    # who is out on which dates.
+    if include_pending:
+        is_admin(current_user)
+    start = start or date.today()
+    end = end or start
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date cannot be after end date")
+    statuses = (LeaveStatus.APPROVED, LeaveStatus.PENDING) if include_pending else (LeaveStatus.APPROVED,)
+    # Until the background load finishes, answer with SQL rather than load the index here
+    if leave_index.ready:
+        out = leave_index.out_between(start, end, statuses)
+    else:
+        out = await query_out_between(db, start, end, statuses)
+    if current_user.role == "admin":
+        return out
+    employee_ids = {entry["employee_id"] for entry in out}
+    names = dict((await db.execute(select(User.id, User.name).where(User.id.in_(employee_ids)))).all()) if employee_ids else {}
+    return [
+        {"name": names.get(entry["employee_id"]), "start_date": entry["start_date"], "end_date": entry["end_date"]}
+        for entry in out
+    ]
+
 @router.get("/my-requests", response_model=List[LeaveRequestResponse])
-def my_leave_requests(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(LeaveRequest).filter(LeaveRequest.employee_id == current_user.id).order_by(LeaveRequest.applied_at.desc()).all()
+async def my_leave_requests(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    leave_type: Optional[LeaveTypeFilter] = None,
+    status: Optional[LeaveStatusFilter] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    query = select(LeaveRequest).filter(LeaveRequest.employee_id == current_user.id)
+    query = filter_leave_page(query, cursor, leave_type, status, from_date, to_date)
+    limit = page_size(limit, cursor)
+    result = await db.execute(limit_page(query, limit))
+    return paginate(result.scalars().all(), limit, response, leave_page_key)
 
 @router.get("/pending", response_model=List[LeaveRequestResponse])
-def pending_requests(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def pending_requests(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    leave_type: Optional[LeaveTypeFilter] = None,
+    employee_id: Optional[int] = None,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
     is_admin(current_user)
-    # Query with joined User table to get employee details
-    leaves = db.query(LeaveRequest).\
+    # Query with joined User table to get employee details; the join also
+    # populates leave.employee so no lazy load is needed per row
+    query = select(LeaveRequest).\
         join(User, LeaveRequest.employee_id == User.id).\
-        filter(LeaveRequest.status == LeaveStatus.PENDING).\
-        order_by(LeaveRequest.applied_at.desc()).\
-        all()
-    
+        options(contains_eager(LeaveRequest.employee)).\
+        filter(LeaveRequest.status == LeaveStatus.PENDING)
+    if employee_id is not None:
+        query = query.filter(LeaveRequest.employee_id == employee_id)
+    query = filter_leave_page(query, cursor, leave_type, None, from_date, to_date)
+    limit = page_size(limit, cursor)
+    result = await db.execute(limit_page(query, limit))
+    leaves = paginate(result.scalars().all(), limit, response, leave_page_key)
+
     # Convert to response model with employee details
     return [{
         **leave.__dict__,
@@ -64,55 +158,54 @@ def pending_requests(db: Session = Depends(get_db), current_user: User = Depends
         }
     } for leave in leaves]
 
+async def review_one(db: AsyncSession, leave_id: int, action: str, reviewer_id: int):
+    outcomes, reviewed = await review_leaves(db, [leave_id], action, reviewer_id)
+    status, detail = outcomes[leave_id]
+    if status == "failed":
+        raise HTTPException(status_code=404 if detail == NOT_FOUND_DETAIL else 400, detail=detail)
+    leave = reviewed[0]
+    await db.refresh(leave)
+    return leave
+
 @router.post("/approve/{leave_id}", response_model=LeaveRequestResponse)
-def approve_leave(leave_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def approve_leave(leave_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     is_admin(current_user)
-    leave = db.query(LeaveRequest).filter(LeaveRequest.id == leave_id).first()
-    if not leave:
-        raise HTTPException(status_code=404, detail="Leave request not found")
-    if leave.status != LeaveStatus.PENDING:
-        raise HTTPException(status_code=400, detail="Leave already processed")
-    # Deduct leave balance
-    user = db.query(User).filter(User.id == leave.employee_id).first()
-    num_days = (leave.end_date - leave.start_date).days + 1
-    if leave.leave_type == LeaveType.CASUAL:
-        if user.casual_leave_balance < num_days:
-            raise HTTPException(status_code=400, detail="Insufficient casual leave balance")
-        user.casual_leave_balance -= num_days
-    elif leave.leave_type == LeaveType.SICK:
-        if user.sick_leave_balance < num_days:
-            raise HTTPException(status_code=400, detail="Insufficient sick leave balance")
-        user.sick_leave_balance -= num_days
-    elif leave.leave_type == LeaveType.WFH:
-        if user.wfh_balance < num_days:
-            raise HTTPException(status_code=400, detail="Insufficient WFH balance")
-        user.wfh_balance -= num_days
-    leave.status = LeaveStatus.APPROVED
-    leave.reviewed_at = date.today()
-    leave.reviewed_by = current_user.id
-    db.commit()
-    db.refresh(leave)
-    return leave
+    # Locks the leave and user rows and deducts the balance through the ledger
+    return await review_one(db, leave_id, "approve", current_user.id)
 
 @router.post("/reject/{leave_id}", response_model=LeaveRequestResponse)
-def reject_leave(leave_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def reject_leave(leave_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     is_admin(current_user)
-    leave = db.query(LeaveRequest).filter(LeaveRequest.id == leave_id).first()
-    if not leave:
-        raise HTTPException(status_code=404, detail="Leave request not found")
-    if leave.status != LeaveStatus.PENDING:
-        raise HTTPException(status_code=400, detail="Leave already processed")
-    leave.status = LeaveStatus.REJECTED
-    leave.reviewed_at = date.today()
-    leave.reviewed_by = current_user.id
-    db.commit()
-    db.refresh(leave)
-    return leave
+    return await review_one(db, leave_id, "reject", current_user.id)
 
-@router.get("/balance", response_model=LeaveBalanceResponse)
-def get_leave_balance(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return LeaveBalanceResponse(
-        casual_leave_balance=current_user.casual_leave_balance,
-        sick_leave_balance=current_user.sick_leave_balance,
-        wfh_balance=current_user.wfh_balance
+@router.post("/review", response_model=List[LeaveReviewResult])
+async def review_leave_requests(request: LeaveReviewRequest, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    is_admin(current_user)
+    # Bulk approve/reject in one transaction; each id gets its own outcome
+    outcomes, _ = await review_leaves(db, request.ids, request.action, current_user.id)
+    return [
+        {"id": leave_id, "status": outcomes[leave_id][0], "detail": outcomes[leave_id][1]}
+        for leave_id in dict.fromkeys(request.ids)
+    ]
+
+@router.get("/ledger/{employee_id}", response_model=List[LeaveLedgerEntry])
+async def leave_ledger(employee_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # Employees can audit their own balance history, admins anyone's
+    if employee_id != current_user.id:
+        is_admin(current_user)
+    result = await db.execute(
+        select(LeaveBalanceLedger).where(LeaveBalanceLedger.employee_id == employee_id).order_by(LeaveBalanceLedger.id)
     )
+    return result.scalars().all()
+
+@router.get("/balance", response_model=LeaveBalanceResponse)
+async def get_leave_balance(request: Request, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    async def build():
+        # Balances are not carried in the token, so read the row
+        user = await db.get(User, current_user.id)
+        return LeaveBalanceResponse(
+            casual_leave_balance=user.casual_leave_balance,
+            sick_leave_balance=user.sick_leave_balance,
+            wfh_balance=user.wfh_balance
+        )
+    return await response_cache.respond(request, "leave_balance", current_user.id, (), build)
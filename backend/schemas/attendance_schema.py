@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class AttendanceStart(BaseModel):
@@ -10,3 +10,20 @@ class AttendanceEnd(BaseModel):
 
 class BreakSchema(BaseModel):
     pass  # For break_in and break_out, no body needed
+
+class ClockEventIn(BaseModel):
+    idempotency_key: str = Field(..., min_length=1, max_length=200)
+    employee_id: int
+    type: Literal["start", "end", "break_in", "break_out"]
+    timestamp: datetime
+    work_summary: Optional[str] = None
+
+class ClockEventBatch(BaseModel):
+    events: List[ClockEventIn] = Field(..., max_length=10000)
+
+class ClockEventResult(BaseModel):
+    idempotency_key: str
+    status: Literal["applied", "duplicate", "rejected"]
+    detail: Optional[str] = None
+    attendance_id: Optional[int] = None
+    break_id: Optional[int] = None
@@ -1,7 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date, datetime
 from enum import Enum
-from typing import Optional
+from typing import List, Literal, Optional
 
 class LeaveType(str, Enum):
     CASUAL = "CASUAL"
@@ -41,3 +41,26 @@ class LeaveBalanceResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class LeaveReviewRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    action: Literal["approve", "reject"]
+
+class LeaveReviewResult(BaseModel):
+    id: int
+    status: Literal["approved", "rejected", "failed"]
+    detail: Optional[str] = None
+
+class LeaveLedgerEntry(BaseModel):
+    id: int
+    employee_id: int
+    leave_type: LeaveType
+    delta: int
+    balance_after: int
+    leave_request_id: Optional[int]
+    reason: str
+    created_by: Optional[int]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
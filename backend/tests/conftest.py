@@ -0,0 +1,82 @@
+# Test app wiring: one SQLite file per session, recreated for every test. The
+# `client` fixture runs each test twice: with the ThreadedSession path
+# (DB_ASYNC=0) and with core.database switched to an aiosqlite AsyncSession
+# (DB_ASYNC=1), so get_async_db, get_async_read_db and async_session_scope
+# run their real code in both modes.
+import os
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="attendance-tests-"), "test.db")
+os.environ["POSTGRES_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["DB_ASYNC"] = "0"
+os.environ.pop("READ_POSTGRES_URL", None)
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["AUTH_MODE"] = "db"
+os.environ["RESPONSE_CACHE_TTL_SECONDS"] = "0"
+# Report per-request query counts in X-DB-Queries (see core.query_stats)
+os.environ["DEBUG"] = "1"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from core.bootstrap import bootstrap
+from core import database
+from core.database import Base, SessionLocal, engine
+from core.response_cache import response_cache
+from main import app
+from utils.leave_index import leave_index
+from models.user import User
+from utils.jwt_token import create_access_token, token_claims
+
+@pytest.fixture(autouse=True)
+def clean_database():
+    Base.metadata.drop_all(bind=engine)
+    bootstrap(engine)
+    response_cache._entries.clear()
+    leave_index.ready = False
+    leave_index._reset()
+    yield
+
+@pytest.fixture(params=["threaded", "async"])
+def db_mode(request, monkeypatch):
+    if request.param == "async":
+        # What core.database builds with DB_ASYNC=1; NullPool because every
+        # TestClient request runs on its own event loop
+        async_engine = create_async_engine(database._async_url(os.environ["POSTGRES_URL"]), poolclass=NullPool)
+        monkeypatch.setattr(database, "DB_ASYNC", True)
+        monkeypatch.setattr(database, "async_engine", async_engine)
+        monkeypatch.setattr(database, "AsyncSessionLocal",
+                            async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False))
+    return request.param
+
+@pytest.fixture
+def client(db_mode):
+    # Not entered as a context manager, so startup hooks (key refresh, leave index) stay off
+    return TestClient(app)
+
+def make_user(email: str, role: str = "user", **columns) -> User:
+    db = SessionLocal()
+    try:
+        user = User(name=email.split("@")[0], email=email, hashed_password="unused", role=role, **columns)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+def auth_headers(user: User) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(token_claims(user))}"}
+
+@pytest.fixture
+def employee():
+    user = make_user("employee@example.com")
+    return user, auth_headers(user)
+
+@pytest.fixture
+def admin():
+    user = make_user("admin@example.com", role="admin")
+    return user, auth_headers(user)
@@ -0,0 +1,17 @@
+import os
+import pytest
+from core.database import SessionLocal
+from utils import archive
+
+def test_archive_dir_is_absolute():
+    assert os.path.isabs(archive.ARCHIVE_DIR)
+
+@pytest.mark.parametrize("months", [0, -1])
+def test_rejects_archiving_open_months(monkeypatch, months):
+    monkeypatch.setattr(archive, "ARCHIVE_AFTER_MONTHS", months)
+    db = SessionLocal()
+    try:
+        with pytest.raises(ValueError, match="ARCHIVE_AFTER_MONTHS"):
+            archive.archive_closed_months(db)
+    finally:
+        db.close()
@@ -0,0 +1,142 @@
+# The routes served from get_async_db, run against both session modes (see conftest)
+import asyncio
+from datetime import date, timedelta
+from core.database import async_session_scope
+from tests.conftest import make_user, auth_headers
+from utils.leave_index import leave_index
+
+def test_clock_day_with_break(client, employee):
+    _, headers = employee
+    assert client.get("/attendance/today", headers=headers).json() == {"start_time": None, "end_time": None, "breaks": []}
+
+    started = client.post("/attendance/start", json={"work_summary": "Office"}, headers=headers)
+    assert started.status_code == 200
+    assert client.post("/attendance/start", json={"work_summary": "Office"}, headers=headers).status_code == 400
+
+    break_in = client.post("/attendance/break-in", headers=headers)
+    assert break_in.status_code == 200
+    break_out = client.post("/attendance/break-out", headers=headers)
+    assert break_out.status_code == 200
+    assert break_out.json()["break_id"] == break_in.json()["break_id"]
+    assert client.post("/attendance/break-out", headers=headers).status_code == 404
+
+    ended = client.post("/attendance/end", json={"work_summary": "Done"}, headers=headers)
+    assert ended.status_code == 200
+
+    today = client.get("/attendance/today", headers=headers).json()
+    assert today["end_time"] is not None
+    assert [b["id"] for b in today["breaks"]] == [break_in.json()["break_id"]]
+    summary = client.get("/attendance/summary", headers=headers).json()
+    assert (summary["total"], summary["present"], summary["absent"]) == (1, 1, 0)
+
+def test_break_without_attendance(client, employee):
+    _, headers = employee
+    assert client.post("/attendance/break-in", headers=headers).status_code == 404
+    assert client.post("/attendance/end", json={}, headers=headers).status_code == 404
+
+def test_apply_and_approve_leave(client, employee, admin):
+    user, headers = employee
+    _, admin_headers = admin
+    day = date.today() + timedelta(days=30)
+    applied = client.post("/leave/apply", headers=headers, json={
+        "leave_type": "CASUAL", "start_date": day.isoformat(), "end_date": (day + timedelta(days=1)).isoformat(),
+    })
+    assert applied.status_code == 200
+    leave_id = applied.json()["id"]
+    assert [l["id"] for l in client.get("/leave/my-requests", headers=headers).json()] == [leave_id]
+    assert [l["id"] for l in client.get("/leave/pending", headers=admin_headers).json()] == [leave_id]
+    assert client.get("/leave/pending", headers=headers).status_code == 403
+
+    approved = client.post(f"/leave/approve/{leave_id}", headers=admin_headers)
+    assert approved.status_code == 200
+    assert approved.json()["status"] == "Approved"
+    assert client.get("/leave/balance", headers=headers).json()["casual_leave_balance"] == 10
+    overlapping = client.post("/leave/apply", headers=headers, json={
+        "leave_type": "WFH", "start_date": day.isoformat(), "end_date": day.isoformat(),
+    })
+    assert overlapping.status_code == 400
+
+def test_calendar_view(client, employee):
+    _, headers = employee
+    client.post("/attendance/start", json={"work_summary": "Office"}, headers=headers)
+    today = date.today()
+    calendar = client.get("/calendar/", params={"month": today.month, "year": today.year}, headers=headers)
+    assert calendar.status_code == 200
+    assert calendar.json()[today.isoformat()] == "present"
+    revalidated = client.get("/calendar/", params={"month": today.month, "year": today.year},
+                             headers={**headers, "If-None-Match": calendar.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+def test_closed_month_sees_backdated_leave(client, employee, admin, monkeypatch):
+    from routers import calendar
+    monkeypatch.setattr(calendar, "RESPONSE_CACHE_TTL_SECONDS", 30)
+    monkeypatch.setattr(calendar, "CLOSED_PERIOD_TTL_SECONDS", 300)
+    _, headers = employee
+    _, admin_headers = admin
+    day = date.today().replace(day=1) - timedelta(days=1)  # last day of the previous month
+    params = {"month": day.month, "year": day.year}
+    before = client.get("/calendar/", params=params, headers=headers)
+    assert before.json()[day.isoformat()] != "leave"
+
+    leave_id = client.post("/leave/apply", headers=headers, json={
+        "leave_type": "CASUAL", "start_date": day.isoformat(), "end_date": day.isoformat(),
+    }).json()["id"]
+    pending = client.get("/calendar/", params=params, headers=headers)
+    assert pending.json()[day.isoformat()] != "leave"
+    assert client.post(f"/leave/approve/{leave_id}", headers=admin_headers).status_code == 200
+    after = client.get("/calendar/", params=params, headers={**headers, "If-None-Match": pending.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.json()[day.isoformat()] == "leave"
+
+def test_current_user_rejects_stale_token(client):
+    user = make_user("stale@example.com", token_version=1)
+    current = auth_headers(user)
+    user.token_version = 0
+    stale = auth_headers(user)
+    assert client.get("/attendance/today", headers=stale).status_code == 401
+    assert client.get("/attendance/today", headers=current).status_code == 200
+
+def test_stateless_mode_verifies_admin_tokens(client, admin, monkeypatch):
+    from core.database import SessionLocal
+    from models.user import User
+    from utils import jwt_token
+    monkeypatch.setattr(jwt_token, "AUTH_MODE", "stateless")
+    user, headers = admin
+    assert client.get("/leave/pending", headers=headers).status_code == 200
+    # Demoted by another worker: no in-process revocation, only the row changed
+    db = SessionLocal()
+    try:
+        row = db.get(User, user.id)
+        row.role, row.token_version = "user", 1
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/leave/pending", headers=headers).status_code == 401
+
+def test_who_is_out_before_and_after_index_load(client, employee, admin):
+    user, headers = employee
+    _, admin_headers = admin
+    day = date.today() + timedelta(days=10)
+    leave_id = client.post("/leave/apply", headers=headers, json={
+        "leave_type": "SICK", "start_date": day.isoformat(), "end_date": day.isoformat(),
+    }).json()["id"]
+    client.post(f"/leave/approve/{leave_id}", headers=admin_headers)
+    params = {"start": day.isoformat(), "include_pending": "true"}
+
+    # A cold index is answered with SQL and left for the background load
+    leave_index.ready = False
+    leave_index._reset()
+    cold = client.get("/leave/out", params=params, headers=admin_headers).json()
+    assert not leave_index.ready
+    assert [(o["leave_id"], o["employee_id"], o["leave_type"], o["status"]) for o in cold] == [
+        (leave_id, user.id, "SICK", "Approved"),
+    ]
+
+    async def load():
+        async with async_session_scope() as db:
+            await leave_index.rebuild(db)
+    asyncio.run(load())
+    assert client.get("/leave/out", params=params, headers=admin_headers).json() == cold
+    assert client.get("/leave/out", params={"start": day.isoformat()}, headers=headers).json() == [
+        {"name": user.name, "start_date": day.isoformat(), "end_date": day.isoformat()},
+    ]
@@ -0,0 +1,105 @@
+# Group commit for break punches (utils.break_buffer), in both session modes
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from core.database import SessionLocal, async_session_scope
+from models.attendance import Attendance
+from tests.conftest import make_user
+from utils.break_buffer import BreakBuffer, BreakRejected, NO_OPEN_BREAK_DETAIL
+
+@pytest.fixture
+def employees(db_mode):
+    # Three employees who started their day
+    users = [make_user(f"user{i}@example.com") for i in range(3)]
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.add_all(Attendance(employee_id=u.id, date=now.date(), start_time=now) for u in users)
+        db.commit()
+    finally:
+        db.close()
+    return [u.id for u in users]
+
+def attendance_ids(employee_ids):
+    db = SessionLocal()
+    try:
+        return [db.query(Attendance.id).filter(Attendance.employee_id == e).scalar() for e in employee_ids]
+    finally:
+        db.close()
+
+def counting_scope(commits):
+    @asynccontextmanager
+    async def scope():
+        async with async_session_scope() as db:
+            commit = db.commit
+
+            async def counted():
+                commits.append(1)
+                await commit()
+            db.commit = counted
+            yield db
+    return scope
+
+class FailingBuffer(BreakBuffer):
+    # Fails every batch holding a punch for `poison`, as a database error would
+    def __init__(self, poison, **kwargs):
+        super().__init__(**kwargs)
+        self.poison = poison
+
+    async def _flush(self, db, punches):
+        if any(p.employee_id == self.poison for p in punches):
+            raise IntegrityError("INSERT INTO breaks", {}, Exception("constraint failed"))
+        await super()._flush(db, punches)
+
+def test_concurrent_punches_share_one_commit(employees):
+    commits = []
+
+    async def run():
+        buffer = BreakBuffer(flush_ms=50)
+        buffer.start(counting_scope(commits))
+        try:
+            return await asyncio.gather(*(buffer.submit("break_in", e) for e in employees))
+        finally:
+            await buffer.stop()
+
+    punches = asyncio.run(run())
+    assert len(commits) == 1
+    assert len({p["break_id"] for p in punches}) == len(employees)
+    assert {p["attendance_id"] for p in punches} == set(attendance_ids(employees))
+
+def test_bad_punch_fails_alone(employees):
+    async def run():
+        buffer = FailingBuffer(poison=employees[0], flush_ms=50)
+        buffer.start(async_session_scope)
+        try:
+            return await asyncio.gather(
+                buffer.submit("break_in", employees[0]),  # database error
+                buffer.submit("break_out", employees[1]),  # no open break
+                buffer.submit("break_in", employees[2]),
+                return_exceptions=True,
+            )
+        finally:
+            await buffer.stop()
+
+    failed, rejected, ok = asyncio.run(run())
+    assert isinstance(failed, IntegrityError)
+    assert isinstance(rejected, BreakRejected) and str(rejected) == NO_OPEN_BREAK_DETAIL
+    assert ok["break_id"] is not None and ok["break_out"] is None
+
+def test_stop_flushes_in_flight_punches(employees):
+    async def run():
+        buffer = BreakBuffer(flush_ms=1000)
+        buffer.start(async_session_scope)
+        in_flight = [asyncio.ensure_future(buffer.submit("break_in", e)) for e in employees]
+        await asyncio.sleep(0)  # let them queue
+        await asyncio.wait_for(buffer.stop(), 5)
+        queued = await asyncio.wait_for(asyncio.gather(*in_flight), 5)
+        # After stop, punches are committed directly instead of waiting on the flusher
+        late = await asyncio.wait_for(buffer.submit("break_out", employees[0]), 5)
+        return queued, late
+
+    queued, late = asyncio.run(run())
+    assert all(p["break_id"] is not None for p in queued)
+    assert late["break_id"] == queued[0]["break_id"] and late["break_out"] is not None
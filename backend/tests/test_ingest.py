@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from core.database import SessionLocal
+from models.archive import ArchivedMonth
+from models.clock_event import ClockEvent
+from tests.conftest import auth_headers, make_user
+from utils import ingest
+
+def punch(key, employee_id, type, timestamp, **fields):
+    return {"idempotency_key": key, "employee_id": employee_id, "type": type,
+            "timestamp": timestamp.isoformat(), **fields}
+
+def upload(client, headers, *events):
+    response = client.post("/attendance/ingest", json={"events": list(events)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_repeated_upload_is_idempotent(client, admin, employee):
+    _, headers = admin
+    user, _ = employee
+    now = datetime.utcnow().replace(microsecond=0)
+    events = [
+        punch("k-start", user.id, "start", now - timedelta(hours=2)),
+        punch("k-in", user.id, "break_in", now - timedelta(hours=1)),
+    ]
+    first = upload(client, headers, *events)
+    assert [r["status"] for r in first] == ["applied", "applied"]
+    again = upload(client, headers, *events)
+    assert [r["status"] for r in again] == ["duplicate", "duplicate"]
+    # Duplicates echo the ids of the stored events
+    assert [(r["attendance_id"], r["break_id"]) for r in again] == [(r["attendance_id"], r["break_id"]) for r in first]
+
+def test_duplicate_within_one_batch(client, admin, employee):
+    _, headers = admin
+    user, _ = employee
+    start = punch("k-start", user.id, "start", datetime.utcnow() - timedelta(hours=1))
+    results = upload(client, headers, start, start)
+    assert [r["status"] for r in results] == ["applied", "duplicate"]
+    assert results[1]["attendance_id"] == results[0]["attendance_id"] is not None
+    assert results[1]["detail"] == results[0]["detail"]
+
+def test_chunk_retried_after_concurrent_upload(client, admin, employee, monkeypatch):
+    _, headers = admin
+    user, _ = employee
+    real_apply = ingest._apply_chunk
+    calls = []
+
+    async def racing_apply(db, events):
+        calls.append(len(events))
+        if len(calls) == 1:
+            # Another upload stores the same key between our lookup and our commit
+            other = SessionLocal()
+            try:
+                other.add(ClockEvent(idempotency_key="k-start", employee_id=user.id, event_type="start",
+                                     event_time=datetime.utcnow(), status="rejected", detail="Raced"))
+                other.commit()
+            finally:
+                other.close()
+            raise IntegrityError("INSERT INTO clock_events", {}, Exception("UNIQUE constraint failed"))
+        return await real_apply(db, events)
+
+    monkeypatch.setattr(ingest, "_apply_chunk", racing_apply)
+    results = upload(client, headers, punch("k-start", user.id, "start", datetime.utcnow()))
+    assert calls == [1, 1]
+    assert results[0]["status"] == "duplicate"
+    assert results[0]["detail"] == "Raced"
+
+def test_archived_month_rejected(client, admin, employee):
+    _, headers = admin
+    user, _ = employee
+    db = SessionLocal()
+    try:
+        db.add(ArchivedMonth(year=2020, month=1, path="/archive/2020-01.json", attendance_rows=0, break_rows=0))
+        db.commit()
+    finally:
+        db.close()
+    results = upload(client, headers, punch("k-old", user.id, "start", datetime(2020, 1, 15, 9)))
+    assert results[0]["status"] == "rejected"
+    assert results[0]["detail"] == "Attendance for this month is archived"
+
+def test_ingest_roles(client, employee):
+    user, user_headers = employee
+    event = punch("k-start", user.id, "start", datetime.utcnow())
+    kiosk_headers = auth_headers(make_user("kiosk@example.com", role="kiosk"))
+    assert client.post("/attendance/ingest", json={"events": [event]}, headers=user_headers).status_code == 403
+    assert upload(client, kiosk_headers, event)[0]["status"] == "applied"
@@ -0,0 +1,101 @@
+# Query counts of the list, calendar and export endpoints must not grow with
+# the number of rows returned. Budgets include get_current_user's user lookup.
+from datetime import date, datetime, timedelta
+from core.database import SessionLocal
+from core.query_stats import assert_max_queries, assert_query_budget
+from models.attendance import Attendance
+from models.breaks import Break
+from models.leave import LeaveRequest, LeaveType
+from routers.admin import _export_rows
+from utils import pagination
+from tests.conftest import make_user
+
+ROWS = 25
+
+def seed_history(employee_ids, days: int = ROWS):
+    # A worked day with one break per employee for each of the last `days` days
+    db = SessionLocal()
+    try:
+        today = date.today()
+        for employee_id in employee_ids:
+            for offset in range(days):
+                day = today - timedelta(days=offset)
+                start = datetime.combine(day, datetime.min.time()).replace(hour=9)
+                attendance = Attendance(employee_id=employee_id, date=day, start_time=start,
+                                        end_time=start + timedelta(hours=8), work_summary="Office")
+                attendance.breaks.append(Break(break_in=start + timedelta(hours=3), break_out=start + timedelta(hours=4)))
+                db.add(attendance)
+        db.commit()
+    finally:
+        db.close()
+
+def seed_pending_leave(employee_ids):
+    db = SessionLocal()
+    try:
+        start = date.today() + timedelta(days=60)
+        for employee_id in employee_ids:
+            db.add(LeaveRequest(employee_id=employee_id, leave_type=LeaveType.WFH, start_date=start, end_date=start))
+        db.commit()
+    finally:
+        db.close()
+
+def test_user_list_budget(client, admin):
+    _, headers = admin
+    for i in range(ROWS):
+        make_user(f"user{i}@example.com")
+    response = client.get("/admin/users", headers=headers)
+    assert len(response.json()) == ROWS + 1
+    assert_query_budget(response, 2)
+    paged = client.get("/admin/users", params={"limit": 10}, headers=headers)
+    assert len(paged.json()) == 10
+    assert_query_budget(paged, 2)
+
+def test_lists_are_paged_by_default(client, admin, monkeypatch):
+    _, headers = admin
+    monkeypatch.setattr(pagination, "DEFAULT_PAGE_SIZE", 10)
+    for i in range(ROWS):
+        make_user(f"user{i}@example.com")
+    seen, cursor = [], None
+    while True:
+        response = client.get("/admin/users", params={"cursor": cursor} if cursor else {}, headers=headers)
+        assert len(response.json()) <= 10
+        seen += [u["id"] for u in response.json()]
+        cursor = response.headers.get(pagination.NEXT_CURSOR_HEADER)
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == ROWS + 1
+
+def test_pending_leave_list_budget(client, admin):
+    _, headers = admin
+    employees = [make_user(f"user{i}@example.com").id for i in range(ROWS)]
+    seed_pending_leave(employees)
+    response = client.get("/leave/pending", headers=headers)
+    assert len(response.json()) == ROWS
+    # Employee names come from the join, not one lazy load per row
+    assert_query_budget(response, 2)
+
+def test_calendar_budget(client, employee):
+    user, headers = employee
+    seed_history([user.id])
+    today = date.today()
+    response = client.get("/calendar/", params={"month": today.month, "year": today.year}, headers=headers)
+    assert response.json()[today.isoformat()] == "present"
+    assert_query_budget(response, 3)
+
+def test_team_calendar_budget(client, admin):
+    _, headers = admin
+    employees = [make_user(f"user{i}@example.com").id for i in range(10)]
+    seed_history(employees, days=5)
+    today = date.today()
+    response = client.get("/calendar/team", params={"month": today.month, "year": today.year}, headers=headers)
+    assert len(response.json()["employees"]) == len(employees) + 1
+    assert_query_budget(response, 4)
+
+def test_export_budget(employee):
+    user, _ = employee
+    seed_history([user.id])
+    today = date.today()
+    # The export streams after the response headers, so count around the row generator itself
+    with assert_max_queries(2):
+        body = "".join(_export_rows(today - timedelta(days=ROWS), today, "csv"))
+    assert body.count("\n") == ROWS + 1
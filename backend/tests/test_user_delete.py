@@ -0,0 +1,69 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import event, func, select
+from core.database import SessionLocal, engine
+from models.attendance import Attendance
+from models.clock_event import ClockEvent
+from models.leave import LeaveRequest
+from models.leave_ledger import LeaveBalanceLedger
+from models.rollup import AttendanceRollup
+from models.user import User
+from tests.conftest import auth_headers, make_user
+
+def enforce_foreign_keys(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+@pytest.fixture
+def foreign_keys():
+    # SQLite leaves FKs unchecked unless each connection turns them on;
+    # dispose so pooled connections are reopened with the pragma
+    event.listen(engine, "connect", enforce_foreign_keys)
+    engine.dispose()
+    yield
+    event.remove(engine, "connect", enforce_foreign_keys)
+    engine.dispose()
+
+def count(model, column, value):
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(model).where(column == value))
+    finally:
+        db.close()
+
+def create_user(client, headers, email):
+    response = client.post("/admin/users", json={"name": email.split("@")[0], "email": email}, headers=headers)
+    assert response.status_code == 200, response.text
+    db = SessionLocal()
+    try:
+        return db.get(User, response.json()["id"])
+    finally:
+        db.close()
+
+def test_delete_user_with_dependents(foreign_keys, client, admin):
+    admin_user, headers = admin
+    user = create_user(client, headers, "temp@example.com")
+    kept = create_user(client, headers, "kept@example.com")
+    user_headers = auth_headers(user)
+
+    # Attendance, a break, rollups, clock events and a reviewed leave with ledger rows
+    assert client.post("/attendance/start", json={"work_summary": "Working"}, headers=user_headers).status_code == 200
+    assert client.post("/attendance/break-in", headers=user_headers).status_code == 200
+    kiosk_event = {"idempotency_key": "k-end", "employee_id": user.id, "type": "end",
+                   "timestamp": (datetime.utcnow() + timedelta(minutes=1)).isoformat()}
+    assert client.post("/attendance/ingest", json={"events": [kiosk_event]}, headers=headers).status_code == 200
+    start = date.today() + timedelta(days=30)
+    leave = client.post("/leave/apply", json={"leave_type": "CASUAL", "start_date": start.isoformat(),
+                                              "end_date": start.isoformat()}, headers=user_headers)
+    assert leave.status_code == 200, leave.text
+    assert client.post(f"/leave/approve/{leave.json()['id']}", headers=headers).status_code == 200
+
+    response = client.delete(f"/admin/users/{user.id}", headers=headers)
+    assert response.status_code == 200, response.text
+    for model in (Attendance, AttendanceRollup, ClockEvent, LeaveRequest, LeaveBalanceLedger):
+        assert count(model, model.employee_id, user.id) == 0
+
+    # The admin who granted balances can go too; the grants stay with created_by cleared
+    other = auth_headers(make_user("other@example.com", role="admin"))
+    assert client.delete(f"/admin/users/{admin_user.id}", headers=other).status_code == 200
+    assert count(LeaveBalanceLedger, LeaveBalanceLedger.employee_id, kept.id) == 3
+    assert count(LeaveBalanceLedger, LeaveBalanceLedger.created_by, admin_user.id) == 0
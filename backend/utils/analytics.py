@@ -0,0 +1,208 @@
+# HR attendance analytics per employee and month: late-arrival rate, average
+# start time, average break length and the longest absence streak. Each month
+# is loaded into NumPy columns (one entry per attendance day) plus an
+# employees x days presence matrix, and every metric is a vectorized reduction
+# over those arrays. Results for closed months are cached; backdated changes
+# invalidate them in the worker that made the change, and other workers pick
+# them up when ANALYTICS_CACHE_TTL_SECONDS runs out.
+#
+# Times are compared in UTC, as stored. An absence is a weekday before today
+# without attendance or approved leave; streaks do not continue across months.
+# NumPy is imported inside the compute functions so that routes which only
+# invalidate the cache keep it off the worker import path.
+import os
+from collections import OrderedDict
+from datetime import date, time, timedelta
+from time import monotonic
+from sqlalchemy import select, func, case
+from starlette.concurrency import run_in_threadpool
+from models.archive import ArchivedMonth
+from models.attendance import Attendance
+from models.breaks import Break
+from models.leave import LeaveRequest, LeaveStatus
+from models.user import User
+from utils.archive import month_bounds, read_archived_days
+from utils.worked_time import seconds_between
+
+# Starts after this UTC time count as late
+ANALYTICS_LATE_AFTER = time.fromisoformat(os.getenv("ANALYTICS_LATE_AFTER", "09:30"))
+ANALYTICS_CACHE_MONTHS = int(os.getenv("ANALYTICS_CACHE_MONTHS", "240"))
+ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "600"))
+LATE_AFTER_MINUTES = ANALYTICS_LATE_AFTER.hour * 60 + ANALYTICS_LATE_AFTER.minute
+
+_month_cache = OrderedDict()  # (year, month) -> (expires_at, employee ids, metrics) of a closed month
+
+def _minutes(ts):
+    return ts.hour * 60 + ts.minute + ts.second / 60
+
+def longest_true_run(matrix):
+    # Longest run of True along each row
+    import numpy as np
+    counts = np.cumsum(matrix, axis=1)
+    at_false = np.where(matrix, 0, counts)
+    runs = counts - np.maximum.accumulate(at_false, axis=1)
+    return runs.max(axis=1) if matrix.shape[1] else np.zeros(matrix.shape[0], dtype=np.int64)
+
+async def _load_days(db, year: int, month: int):
+    # (employee_id, date, start_time, closed break seconds, closed break count) per attendance day
+    archived = await db.get(ArchivedMonth, (year, month))
+    if archived is not None:
+        rows = await run_in_threadpool(read_archived_days, archived.path)
+        return [
+            (
+                r["employee_id"], r["date"], r["start_time"],
+                sum((b["break_out"] - b["break_in"]).total_seconds() for b in r["breaks"] if b["break_out"]),
+                sum(1 for b in r["breaks"] if b["break_out"]),
+            )
+            for r in rows
+        ]
+    first, last = month_bounds(year, month)
+    closed = Break.break_out.isnot(None)
+    dialect = db.get_bind().dialect.name
+    result = await db.execute(select(
+        Attendance.employee_id, Attendance.date, Attendance.start_time,
+        func.coalesce(func.sum(case((closed, seconds_between(dialect, Break.break_in, Break.break_out)), else_=0)), 0),
+        func.count(Break.break_out),
+    ).outerjoin(Break, Break.attendance_id == Attendance.id).where(
+        Attendance.date >= first,
+        Attendance.date <= last,
+    ).group_by(Attendance.id, Attendance.employee_id, Attendance.date, Attendance.start_time))
+    return result.all()
+
+async def _load_leave(db, first: date, last: date):
+    result = await db.execute(select(LeaveRequest.employee_id, LeaveRequest.start_date, LeaveRequest.end_date).where(
+        LeaveRequest.status == LeaveStatus.APPROVED,
+        LeaveRequest.end_date >= first,
+        LeaveRequest.start_date <= last,
+    ))
+    return result.all()
+
+def compute_month(year: int, month: int, employee_ids, days, leave, today: date):
+    # Per-employee metrics for one month; employee_ids must be sorted
+    import numpy as np
+    first, last = month_bounds(year, month)
+    num_days = (last - first).days + 1
+    employees = np.asarray(employee_ids, dtype=np.int64)
+    n = len(employees)
+
+    # Columnar view of the attendance days of known employees
+    emp = np.fromiter((d[0] for d in days), dtype=np.int64, count=len(days))
+    row = np.searchsorted(employees, emp)
+    known = (row < n) & (employees[np.minimum(row, max(n - 1, 0))] == emp) if n else np.zeros(len(days), bool)
+    started = np.fromiter((d[2] is not None for d in days), dtype=bool, count=len(days))
+    keep = known & started
+    row = row[keep]
+    day_index = np.fromiter(((d[1] - first).days for d in days), dtype=np.int64, count=len(days))[keep]
+    start_minutes = np.fromiter((_minutes(d[2]) if d[2] else 0.0 for d in days), dtype=np.float64, count=len(days))[keep]
+    break_seconds = np.fromiter((float(d[3] or 0) for d in days), dtype=np.float64, count=len(days))[keep]
+    break_count = np.fromiter((int(d[4] or 0) for d in days), dtype=np.int64, count=len(days))[keep]
+
+    present_days = np.bincount(row, minlength=n)
+    late_days = np.bincount(row, weights=start_minutes > LATE_AFTER_MINUTES, minlength=n).astype(np.int64)
+    start_sum = np.bincount(row, weights=start_minutes, minlength=n)
+    break_sum = np.bincount(row, weights=break_seconds, minlength=n)
+    breaks = np.bincount(row, weights=break_count, minlength=n).astype(np.int64)
+
+    # Employees x days: attended or on approved leave, then absences on past weekdays
+    covered = np.zeros((n, num_days), dtype=bool)
+    covered[row, day_index] = True
+    leave_rows = np.searchsorted(employees, [l[0] for l in leave]) if leave and n else []
+    for r, (employee_id, start, end) in zip(leave_rows, leave):
+        if r < n and employees[r] == employee_id:
+            covered[r, max((start - first).days, 0):min((end - first).days, num_days - 1) + 1] = True
+    calendar_days = [first + timedelta(days=i) for i in range(num_days)]
+    workdays = np.array([d.weekday() < 5 and d < today for d in calendar_days], dtype=bool)
+    absent = ~covered[:, workdays]
+
+    return {
+        "employee_id": employees,
+        "workdays": np.full(n, int(workdays.sum()), dtype=np.int64),
+        "present_days": present_days,
+        "late_days": late_days,
+        "start_minutes_sum": start_sum,
+        "break_seconds_sum": break_sum,
+        "break_count": breaks,
+        "absent_days": absent.sum(axis=1),
+        "longest_absence_streak": longest_true_run(absent),
+    }
+
+def _clock(minutes):
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _ratio(numerator, denominator):
+    return round(float(numerator) / float(denominator), 4) if denominator else None
+
+def summarize(metrics, names, employee_ids=None):
+    # JSON-ready report for one month; optionally restricted to some employees
+    import numpy as np
+    mask = np.ones(len(metrics["employee_id"]), dtype=bool)
+    if employee_ids:
+        mask = np.isin(metrics["employee_id"], list(employee_ids))
+    m = {k: v[mask] for k, v in metrics.items()}
+    present = int(m["present_days"].sum())
+    breaks = int(m["break_count"].sum())
+    return {
+        "company": {
+            "employees": int(mask.sum()),
+            "present_days": present,
+            "absent_days": int(m["absent_days"].sum()),
+            "late_rate": _ratio(m["late_days"].sum(), present),
+            "avg_start": _clock(m["start_minutes_sum"].sum() / present) if present else None,
+            "avg_break_minutes": round(float(m["break_seconds_sum"].sum()) / breaks / 60, 1) if breaks else None,
+            "longest_absence_streak": int(m["longest_absence_streak"].max()) if mask.any() else 0,
+        },
+        "employees": [
+            {
+                "employee_id": int(m["employee_id"][i]),
+                "name": names.get(int(m["employee_id"][i])),
+                "workdays": int(m["workdays"][i]),
+                "present_days": int(m["present_days"][i]),
+                "absent_days": int(m["absent_days"][i]),
+                "late_days": int(m["late_days"][i]),
+                "late_rate": _ratio(m["late_days"][i], m["present_days"][i]),
+                "avg_start": _clock(m["start_minutes_sum"][i] / m["present_days"][i]) if m["present_days"][i] else None,
+                "avg_break_minutes": round(float(m["break_seconds_sum"][i]) / m["break_count"][i] / 60, 1)
+                if m["break_count"][i] else None,
+                "longest_absence_streak": int(m["longest_absence_streak"][i]),
+            }
+            for i in range(len(m["employee_id"]))
+        ],
+    }
+
+def invalidate_months(start: date, end: date):
+    # Drop cached months touching [start, end], e.g. after a backdated change
+    for key in [k for k in _month_cache if (start.year, start.month) <= k <= (end.year, end.month)]:
+        del _month_cache[key]
+
+async def month_metrics(db, year: int, month: int, employee_ids, today: date):
+    # Closed months come from the cache after their first computation
+    closed = month_bounds(year, month)[1] < today
+    key = (year, month)
+    if closed and key in _month_cache:
+        expires_at, cached_ids, metrics = _month_cache[key]
+        if cached_ids == employee_ids and expires_at > monotonic():
+            _month_cache.move_to_end(key)
+            return metrics
+    first, last = month_bounds(year, month)
+    days = await _load_days(db, year, month)
+    leave = await _load_leave(db, first, last)
+    metrics = await run_in_threadpool(compute_month, year, month, employee_ids, days, leave, today)
+    if closed and ANALYTICS_CACHE_TTL_SECONDS > 0:
+        _month_cache[key] = (monotonic() + ANALYTICS_CACHE_TTL_SECONDS, employee_ids, metrics)
+        _month_cache.move_to_end(key)
+        while len(_month_cache) > ANALYTICS_CACHE_MONTHS:
+            _month_cache.popitem(last=False)
+    return metrics
+
+async def analytics_report(db, months, employee_ids=None, today: date = None):
+    # months: (year, month) pairs, oldest first
+    today = today or date.today()
+    users = (await db.execute(select(User.id, User.name).order_by(User.id))).all()
+    names = dict(users)
+    all_ids = tuple(user_id for user_id, _ in users)
+    report = []
+    for year, month in months:
+        metrics = await month_metrics(db, year, month, all_ids, today)
+        report.append({"month": f"{year:04d}-{month:02d}", **summarize(metrics, names, employee_ids)})
+    return report
@@ -0,0 +1,160 @@
+# Cold tier for closed months of attendance and breaks. The archive job writes
+# each month to one zstd-compressed Parquet file (breaks nested in their
+# attendance row), records it in the archived_months manifest, and deletes the
+# month from the hot tables in the same transaction. Index size and vacuum
+# work then follow the recent months only. Readers look months up in the
+# manifest and read archived ones from the file instead of SQL.
+#
+#   python -m utils.archive                    archive months older than ARCHIVE_AFTER_MONTHS
+#   python -m utils.archive --before 2024-01   archive every month before January 2024
+#
+# pyarrow is only imported when a month is written or read from the archive.
+import argparse
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, delete, func, tuple_
+from models.archive import ArchivedMonth
+from models.attendance import Attendance
+from models.breaks import Break
+
+# Resolved once, so the manifest records paths that don't depend on the reader's cwd
+ARCHIVE_DIR = os.path.abspath(os.getenv("ARCHIVE_DIR", "archive"))
+# Months kept hot, counting the current one
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "3"))
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Reading or writing archived attendance requires pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("employee_id", pa.int64()),
+        ("date", pa.date32()),
+        ("start_time", pa.timestamp("us")),
+        ("end_time", pa.timestamp("us")),
+        ("work_summary", pa.string()),
+        ("breaks", pa.list_(pa.struct([
+            ("id", pa.int64()),
+            ("break_in", pa.timestamp("us")),
+            ("break_out", pa.timestamp("us")),
+        ]))),
+    ])
+
+def month_bounds(year: int, month: int):
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first, following - timedelta(days=1)
+
+def months_between(start: date, end: date):
+    # (year, month) for every month touching [start, end], oldest first
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+def archived_months_query(months):
+    # Manifest rows for the given (year, month) pairs; run with the caller's session
+    return select(ArchivedMonth).where(tuple_(ArchivedMonth.year, ArchivedMonth.month).in_(list(months)))
+
+def read_archived_days(path: str, employee_id: int = None, day: date = None):
+    # Attendance dicts (with a "breaks" list) from one archived month, ordered by date and id
+    _, pq = _pyarrow()
+    filters = []
+    if employee_id is not None:
+        filters.append(("employee_id", "=", employee_id))
+    if day is not None:
+        filters.append(("date", "=", day))
+    rows = pq.read_table(path, filters=filters or None).to_pylist()
+    rows.sort(key=lambda r: (r["date"], r["id"]))
+    return rows
+
+def archive_month(db, year: int, month: int):
+    # Moves one month to the cold tier; db is a blocking Session. Returns the
+    # manifest row, or None for a month with no attendance (nothing is written).
+    pa, pq = _pyarrow()
+    if db.get(ArchivedMonth, (year, month)) is not None:
+        raise ValueError(f"{year}-{month:02d} is already archived")
+    first, last = month_bounds(year, month)
+    in_month = (Attendance.date >= first, Attendance.date <= last)
+
+    rows = {}
+    for att in db.execute(select(
+        Attendance.id, Attendance.employee_id, Attendance.date, Attendance.start_time,
+        Attendance.end_time, Attendance.work_summary,
+    ).where(*in_month).order_by(Attendance.employee_id, Attendance.date)):
+        rows[att.id] = {**att._asdict(), "breaks": []}
+    break_count = 0
+    for brk in db.execute(select(Break.id, Break.attendance_id, Break.break_in, Break.break_out).join(
+        Attendance, Attendance.id == Break.attendance_id,
+    ).where(*in_month).order_by(Break.break_in)):
+        rows[brk.attendance_id]["breaks"].append({"id": brk.id, "break_in": brk.break_in, "break_out": brk.break_out})
+        break_count += 1
+    if not rows:
+        return None
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"attendance_{year:04d}_{month:02d}.parquet")
+    tmp_path = path + ".tmp"
+    # Sorted by employee so per-employee reads can skip row groups
+    pq.write_table(pa.Table.from_pylist(list(rows.values()), schema=_schema(pa)), tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+
+    try:
+        month_ids = select(Attendance.id).where(*in_month)
+        deleted_breaks = db.execute(delete(Break).where(Break.attendance_id.in_(month_ids))).rowcount
+        deleted_attendance = db.execute(delete(Attendance).where(*in_month)).rowcount
+        if (deleted_attendance, deleted_breaks) != (len(rows), break_count):
+            # Rows changed while the file was written; leave the month hot and retry later
+            raise RuntimeError(f"{year}-{month:02d} changed during archival")
+        entry = ArchivedMonth(year=year, month=month, path=path,
+                              attendance_rows=len(rows), break_rows=break_count, archived_at=datetime.utcnow())
+        db.add(entry)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        os.remove(path)
+        raise
+    return entry
+
+def archive_closed_months(db, before: date = None):
+    # Archives every not-yet-archived month that ends before `before`; empty months are skipped
+    if before is None:
+        if ARCHIVE_AFTER_MONTHS < 1:
+            # 0 would archive the current, still open month
+            raise ValueError("ARCHIVE_AFTER_MONTHS must be at least 1")
+        today = date.today()
+        index = today.year * 12 + today.month - 1 - (ARCHIVE_AFTER_MONTHS - 1)
+        before = date(index // 12, index % 12 + 1, 1)
+    oldest = db.execute(select(func.min(Attendance.date))).scalar()
+    if oldest is None or oldest >= before:
+        return []
+    archived = {(m.year, m.month) for m in db.execute(select(ArchivedMonth)).scalars()}
+    entries = (
+        archive_month(db, year, month)
+        for year, month in months_between(oldest, before - timedelta(days=1))
+        if (year, month) not in archived
+    )
+    return [entry for entry in entries if entry is not None]
+
+if __name__ == "__main__":
+    import models  # noqa: F401  (register all mappers)
+    from core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move closed months of attendance to the Parquet archive")
+    parser.add_argument("--before", help="archive months before this one (YYYY-MM)")
+    args = parser.parse_args()
+    before = datetime.strptime(args.before, "%Y-%m").date() if args.before else None
+    session = SessionLocal()
+    try:
+        for entry in archive_closed_months(session, before):
+            print(f"Archived {entry.year}-{entry.month:02d}: {entry.attendance_rows} days, "
+                  f"{entry.break_rows} breaks -> {entry.path}")
+    finally:
+        session.close()
@@ -0,0 +1,85 @@
+# Live attendance changes for the admin board. The clock routes publish one
+# event per committed change; every connected board subscribes and receives
+# it. The in-process broker fans out within a worker; set_broker() swaps in
+# another implementation (e.g. backed by Redis or Postgres LISTEN/NOTIFY)
+# when boards must see changes made by other workers.
+import asyncio
+from abc import ABC, abstractmethod
+import os
+from datetime import datetime
+
+# Events a slow subscriber may fall behind by before it is told to resync
+FEED_MAX_PENDING = int(os.getenv("FEED_MAX_PENDING", "1000"))
+RESYNC = {"type": "resync"}
+
+def attendance_event(kind: str, employee_id: int, day, attendance_id: int, **fields) -> dict:
+    # kind is start, end, break_in or break_out; fields carry the changed
+    # timestamps so a board can upsert the row by attendance_id
+    event = {"type": kind, "employee_id": employee_id, "date": day.isoformat(), "attendance_id": attendance_id}
+    for name, value in fields.items():
+        event[name] = value.isoformat() if isinstance(value, datetime) else value
+    return event
+
+class Subscription:
+
+    def __init__(self, max_pending: int = FEED_MAX_PENDING):
+        self.queue = asyncio.Queue(max_pending)
+
+    async def get(self, timeout: float):
+        # Next event, or None when nothing arrived within timeout
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class Broker(ABC):
+
+    @abstractmethod
+    async def publish(self, event: dict):
+        ...
+
+    @abstractmethod
+    def subscribe(self) -> Subscription:
+        ...
+
+    @abstractmethod
+    def unsubscribe(self, subscription: Subscription):
+        ...
+
+class InMemoryBroker(Broker):
+    # Publishing never waits on subscribers: a full queue is replaced by a
+    # single resync event and the subscriber is dropped
+
+    def __init__(self):
+        self._subscriptions = set()
+
+    async def publish(self, event: dict):
+        for subscription in list(self._subscriptions):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.unsubscribe(subscription)
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(RESYNC)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription()
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+broker: Broker = InMemoryBroker()
+
+def set_broker(new_broker: Broker):
+    global broker
+    broker = new_broker
+
+async def publish(event: dict):
+    await broker.publish(event)
@@ -0,0 +1,186 @@
+# Group commit for break punches. With BREAK_BUFFER=1 the break routes hand
+# their punch to this buffer instead of running their own transaction; a
+# single flusher task collects punches for BREAK_FLUSH_MS (or until
+# BREAK_BATCH_MAX are waiting) and applies them all in one transaction: one
+# attendance lookup, one open-break lookup, a batched INSERT/UPDATE, one
+# rollup upsert and one commit. Each caller awaits its own future and gets
+# its own break id, with the punch timestamp taken when it was submitted. A
+# batch that fails is retried one punch per transaction, so only the caller
+# whose punch is at fault gets the error.
+#
+# BREAK_DURABILITY:
+#   full     callers are answered after the batch commits (default)
+#   relaxed  as full, but on Postgres the batch commits with
+#            synchronous_commit off: no WAL flush wait, and a crash can lose
+#            the last few hundred milliseconds of acknowledged punches
+import asyncio
+import logging
+import os
+from datetime import datetime
+from sqlalchemy import select, text, tuple_
+from models.attendance import Attendance
+from models.breaks import Break
+from utils.rollups import bump_rollups, span_seconds
+
+BREAK_BUFFER = os.getenv("BREAK_BUFFER", "0") == "1"
+BREAK_FLUSH_MS = float(os.getenv("BREAK_FLUSH_MS", "5"))
+BREAK_BATCH_MAX = int(os.getenv("BREAK_BATCH_MAX", "500"))
+BREAK_DURABILITY = os.getenv("BREAK_DURABILITY", "full")
+
+NO_ATTENDANCE_DETAIL = "No attendance record found for today."
+NO_OPEN_BREAK_DETAIL = "No open break found to end."
+
+logger = logging.getLogger(__name__)
+
+class BreakRejected(Exception):
+    # The punch failed validation; str(e) is the detail the route returns
+    pass
+
+class _Punch:
+    __slots__ = ("kind", "employee_id", "at", "future")
+
+    def __init__(self, kind: str, employee_id: int, at: datetime, future):
+        self.kind = kind
+        self.employee_id = employee_id
+        self.at = at
+        self.future = future
+
+class BreakBuffer:
+
+    def __init__(self, flush_ms: float = BREAK_FLUSH_MS, batch_max: int = BREAK_BATCH_MAX,
+                 durability: str = BREAK_DURABILITY):
+        self.flush_seconds = flush_ms / 1000
+        self.batch_max = batch_max
+        self.durability = durability
+        self._queue = None
+        self._task = None
+        self._session_factory = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def submit(self, kind: str, employee_id: int) -> dict:
+        # kind is break_in or break_out. Returns {"break_id", "attendance_id",
+        # "break_in", "break_out"} once committed; raises BreakRejected.
+        future = asyncio.get_running_loop().create_future()
+        punch = _Punch(kind, employee_id, datetime.utcnow(), future)
+        if self.running:
+            # No await between the check and the put, so the punch is queued
+            # ahead of the sentinel stop() adds and is flushed before it returns
+            self._queue.put_nowait(punch)
+        elif self._session_factory is not None:
+            # Stopped (shutting down): commit this punch on its own
+            await self._commit(self._session_factory, [punch])
+        else:
+            raise RuntimeError("Break buffer is not running")
+        return await future
+
+    async def _flush(self, db, punches):
+        if self.durability == "relaxed" and db.get_bind().dialect.name == "postgresql":
+            await db.execute(text("SET LOCAL synchronous_commit TO OFF"))
+        days = {(p.employee_id, p.at.date()) for p in punches}
+        attendance = {
+            (employee_id, day): attendance_id
+            for attendance_id, employee_id, day in (await db.execute(select(
+                Attendance.id, Attendance.employee_id, Attendance.date,
+            ).where(tuple_(Attendance.employee_id, Attendance.date).in_(list(days))))).all()
+        }
+        # Open breaks per attendance, oldest first; punches in this batch add to them
+        open_breaks = {}
+        if attendance:
+            rows = await db.execute(select(Break).where(
+                Break.attendance_id.in_(list(attendance.values())),
+                Break.break_out.is_(None),
+            ).order_by(Break.break_in))
+            for brk in rows.scalars():
+                open_breaks.setdefault(brk.attendance_id, []).append(brk)
+
+        outcomes = []  # (punch, Break or rejection detail)
+        rollup_changes = []
+        for punch in punches:
+            attendance_id = attendance.get((punch.employee_id, punch.at.date()))
+            if attendance_id is None:
+                outcomes.append((punch, NO_ATTENDANCE_DETAIL))
+            elif punch.kind == "break_in":
+                brk = Break(attendance_id=attendance_id, break_in=punch.at)
+                db.add(brk)
+                open_breaks.setdefault(attendance_id, []).append(brk)
+                outcomes.append((punch, brk))
+            elif open_breaks.get(attendance_id):
+                brk = open_breaks[attendance_id].pop()  # latest open break
+                brk.break_out = punch.at
+                rollup_changes.append((punch.employee_id, punch.at.date(), {
+                    "break_seconds": span_seconds(brk.break_in, brk.break_out),
+                }))
+                outcomes.append((punch, brk))
+            else:
+                outcomes.append((punch, NO_OPEN_BREAK_DETAIL))
+
+        await db.flush()
+        await bump_rollups(db, rollup_changes)
+        await db.commit()
+        for punch, outcome in outcomes:
+            if punch.future.done():
+                continue  # caller went away
+            if isinstance(outcome, str):
+                punch.future.set_exception(BreakRejected(outcome))
+            else:
+                punch.future.set_result({
+                    "break_id": outcome.id,
+                    "attendance_id": outcome.attendance_id,
+                    "break_in": outcome.break_in,
+                    "break_out": outcome.break_out,
+                })
+
+    async def _run(self, session_factory):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            punches = [first]
+            # Let concurrent punches join the batch
+            deadline = asyncio.get_running_loop().time() + self.flush_seconds
+            while len(punches) < self.batch_max:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    punch = await asyncio.wait_for(self._queue.get(), timeout) if timeout > 0 else self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if punch is None:
+                    stopping = True
+                    break
+                punches.append(punch)
+            await self._commit(session_factory, punches)
+
+    async def _commit(self, session_factory, punches):
+        try:
+            async with session_factory() as db:
+                await self._flush(db, punches)
+        except Exception as e:
+            if len(punches) > 1:
+                # Retry one punch per transaction so only the punch at fault fails
+                logger.warning("Break batch of %d punches failed, retrying one by one", len(punches), exc_info=True)
+                for punch in punches:
+                    await self._commit(session_factory, [punch])
+                return
+            logger.exception("Break punch failed")
+            if not punches[0].future.done():
+                punches[0].future.set_exception(e)
+
+    def start(self, session_factory):
+        # session_factory is an async context manager yielding an AsyncSession-like db
+        if self._task is None:
+            self._session_factory = session_factory
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run(session_factory))
+
+    async def stop(self):
+        # Flushes punches already submitted, then ends the flusher
+        if self._task is not None:
+            task, self._task = self._task, None
+            await self._queue.put(None)
+            await task
+
+break_buffer = BreakBuffer()
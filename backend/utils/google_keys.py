@@ -0,0 +1,116 @@
+# Google ID token verification against an in-process cache of Google's signing
+# certificates. The cache is refreshed in the background according to the
+# Cache-Control max-age of the certs response, so logins never wait on HTTP.
+import asyncio
+from abc import ABC, abstractmethod
+import os
+import re
+import time
+import httpx
+
+GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID", "853434167999-0aj5opdatd6i58n6uifanipcchfkunqd.apps.googleusercontent.com")
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+# Refresh this long before the certs expire; used as TTL when no max-age is sent
+REFRESH_MARGIN_SECONDS = 60
+DEFAULT_TTL_SECONDS = 3600
+RETRY_SECONDS = 30
+
+class KeySource(ABC):
+    # Supplies Google's signing certs as {key_id: PEM certificate}
+
+    @abstractmethod
+    async def get_certs(self, force_refresh: bool = False) -> dict:
+        ...
+
+    def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class StaticKeySource(KeySource):
+    # Fixed certs, for offline tests and local stand-ins
+
+    def __init__(self, certs: dict):
+        self.certs = certs
+
+    async def get_certs(self, force_refresh: bool = False) -> dict:
+        return self.certs
+
+class HTTPKeySource(KeySource):
+    # Fetches certs from a URL and keeps them fresh with a background task
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL):
+        self.url = url
+        self.certs = {}
+        self.expires_at = 0.0
+        self.fetched_at = float("-inf")
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    async def refresh(self):
+        async with httpx.AsyncClient(timeout=10) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        match = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        ttl = int(match.group(1)) if match else DEFAULT_TTL_SECONDS
+        self.certs = response.json()
+        self.fetched_at = time.monotonic()
+        self.expires_at = self.fetched_at + ttl
+
+    def _stale(self, force_refresh: bool) -> bool:
+        now = time.monotonic()
+        # Forced refreshes (unknown key id) are rate limited so bogus tokens cannot hammer Google
+        if force_refresh and now - self.fetched_at >= REFRESH_MARGIN_SECONDS:
+            return True
+        return not self.certs or now >= self.expires_at
+
+    async def get_certs(self, force_refresh: bool = False) -> dict:
+        if self._stale(force_refresh):
+            async with self._lock:
+                # Another caller may have refreshed while we waited
+                if self._stale(force_refresh):
+                    await self.refresh()
+        return self.certs
+
+    async def _refresh_loop(self):
+        while True:
+            delay = max(self.expires_at - time.monotonic() - REFRESH_MARGIN_SECONDS, 0)
+            await asyncio.sleep(delay)
+            try:
+                async with self._lock:
+                    await self.refresh()
+            except (httpx.HTTPError, ValueError):
+                # Keep serving the cached certs and try again shortly
+                await asyncio.sleep(RETRY_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+key_source: KeySource = HTTPKeySource()
+
+def set_key_source(source: KeySource):
+    global key_source
+    key_source = source
+
+async def verify_google_token(token: str, audience: str = GOOGLE_CLIENT_ID) -> dict:
+    # Returns the verified claims; raises ValueError for any invalid token.
+    # google-auth is imported here so workers that never see a Google sign-in skip it.
+    from google.auth import jwt as google_jwt
+    certs = await key_source.get_certs()
+    key_id = google_jwt.decode_header(token).get("kid")
+    if key_id and key_id not in certs:
+        # Google rotated its keys since the last refresh
+        certs = await key_source.get_certs(force_refresh=True)
+    idinfo = google_jwt.decode(token, certs=certs, audience=audience)
+    if idinfo.get("iss") not in GOOGLE_ISSUERS:
+        raise ValueError("Wrong issuer")
+    return idinfo
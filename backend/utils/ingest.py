@@ -0,0 +1,202 @@
+# Batch ingestion of buffered clock punches from kiosks and badge readers.
+# Events are applied in timestamp order, INGEST_CHUNK_SIZE per transaction, with
+# one lookup query per table per chunk and multi-row writes at flush time.
+import os
+from datetime import timezone
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+from models.attendance import Attendance
+from models.breaks import Break
+from models.clock_event import ClockEvent
+from models.user import User
+from utils.rollups import bump_rollups, span_seconds
+from utils.attendance_feed import attendance_event
+from utils.archive import archived_months_query
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "1000"))
+
+def _utc_naive(ts):
+    # Attendance stores naive UTC timestamps
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+# Attendance field each punch type sets, as reported to the live board
+FEED_FIELDS = {"start": "start_time", "end": "end_time", "break_in": "break_in", "break_out": "break_out"}
+
+def _result(key, status, detail=None, attendance_id=None, break_id=None):
+    return {"idempotency_key": key, "status": status, "detail": detail,
+            "attendance_id": attendance_id, "break_id": break_id}
+
+async def _apply_chunk(db, events):
+    # Returns a result per event, in the same order as events
+    keys = [e.idempotency_key for e in events]
+    stored = {
+        ev.idempotency_key: ev
+        for ev in (await db.execute(select(ClockEvent).where(ClockEvent.idempotency_key.in_(keys)))).scalars()
+    }
+    employee_ids = {e.employee_id for e in events}
+    known_users = set((await db.execute(select(User.id).where(User.id.in_(employee_ids)))).scalars())
+    days = {(e.employee_id, _utc_naive(e.timestamp).date()) for e in events}
+    # Punches into archived months are refused; the cold tier is read-only
+    archived = {
+        (m.year, m.month)
+        for m in (await db.execute(archived_months_query({(d.year, d.month) for _, d in days}))).scalars()
+    }
+    attendance = {
+        (a.employee_id, a.date): a
+        for a in (await db.execute(select(Attendance).where(
+            tuple_(Attendance.employee_id, Attendance.date).in_(list(days))
+        ))).scalars()
+    }
+    # Open breaks keyed by Attendance object, so rows created in this chunk fit in too
+    open_breaks = {}
+    if attendance:
+        by_id = {a.id: a for a in attendance.values()}
+        rows = await db.execute(select(Break).where(
+            Break.attendance_id.in_(list(by_id)),
+            Break.break_out.is_(None),
+        ).order_by(Break.break_in))
+        for b in rows.scalars():
+            open_breaks.setdefault(by_id[b.attendance_id], []).append(b)
+
+    outcomes = []  # (event, status, detail, attendance, break)
+    rollup_changes = []
+    seen = set()
+    for event in events:
+        key = event.idempotency_key
+        if key in stored or key in seen:
+            outcomes.append((event, "duplicate", None, None, None))
+            continue
+        seen.add(key)
+        ts = _utc_naive(event.timestamp)
+        day = ts.date()
+        if event.employee_id not in known_users:
+            outcomes.append((event, "rejected", "Unknown employee", None, None))
+            continue
+        if (day.year, day.month) in archived:
+            outcomes.append((event, "rejected", "Attendance for this month is archived", None, None))
+            continue
+        att = attendance.get((event.employee_id, day))
+
+        if event.type == "start":
+            if att is not None:
+                outcomes.append((event, "rejected", "Attendance already started today.", att, None))
+                continue
+            att = Attendance(employee_id=event.employee_id, date=day, start_time=ts, work_summary=event.work_summary)
+            db.add(att)
+            attendance[(event.employee_id, day)] = att
+            rollup_changes.append((event.employee_id, day, {
+                "total_days": 1, "present_days": 1,
+                "leave_days": 1 if event.work_summary == "LEAVE" else 0,
+            }))
+            outcomes.append((event, "applied", None, att, None))
+            continue
+
+        if att is None:
+            outcomes.append((event, "rejected", "No attendance record found for today.", None, None))
+            continue
+
+        if event.type == "end":
+            if att.start_time is not None and ts < att.start_time:
+                # Would roll up negative worked time
+                outcomes.append((event, "rejected", "End time is before the start time.", att, None))
+                continue
+            old_seconds = span_seconds(att.start_time, att.end_time)
+            was_leave = att.work_summary == "LEAVE"
+            att.end_time = ts
+            if event.work_summary:
+                att.work_summary = event.work_summary
+            rollup_changes.append((event.employee_id, day, {
+                "worked_seconds": span_seconds(att.start_time, att.end_time) - old_seconds,
+                "leave_days": int(att.work_summary == "LEAVE") - int(was_leave),
+            }))
+            outcomes.append((event, "applied", None, att, None))
+        elif event.type == "break_in":
+            brk = Break(break_in=ts)
+            if att.id is None:
+                brk.attendance = att  # attendance inserted in this same flush
+            else:
+                brk.attendance_id = att.id
+            db.add(brk)
+            open_breaks.setdefault(att, []).append(brk)
+            outcomes.append((event, "applied", None, att, brk))
+        else:  # break_out
+            pending = open_breaks.get(att)
+            if not pending:
+                outcomes.append((event, "rejected", "No open break found to end.", att, None))
+                continue
+            if ts < pending[-1].break_in:
+                outcomes.append((event, "rejected", "Break end is before the break start.", att, None))
+                continue
+            brk = pending.pop()  # latest open break
+            brk.break_out = ts
+            rollup_changes.append((event.employee_id, day, {"break_seconds": span_seconds(brk.break_in, brk.break_out)}))
+            outcomes.append((event, "applied", None, att, brk))
+
+    # Multi-row INSERTs for new attendance/breaks and batched UPDATEs for closed ones
+    await db.flush()
+
+    results = []
+    log_rows = []
+    first = {}  # key -> result of its first occurrence in this chunk
+    for event, status, detail, att, brk in outcomes:
+        key = event.idempotency_key
+        if status == "duplicate":
+            # Repeats of a stored key echo the stored event; repeats within the
+            # chunk echo the first occurrence
+            prior = stored.get(key)
+            if prior is not None:
+                results.append(_result(key, "duplicate", prior.detail, prior.attendance_id, prior.break_id))
+            else:
+                prior = first[key]
+                results.append(_result(key, "duplicate", prior["detail"], prior["attendance_id"], prior["break_id"]))
+            continue
+        attendance_id = att.id if att is not None else None
+        break_id = brk.id if brk is not None else None
+        first[key] = _result(key, status, detail, attendance_id, break_id)
+        results.append(first[key])
+        log_rows.append(ClockEvent(
+            idempotency_key=key,
+            employee_id=event.employee_id,
+            event_type=event.type,
+            event_time=_utc_naive(event.timestamp),
+            status=status,
+            detail=detail,
+            attendance_id=attendance_id,
+            break_id=break_id,
+        ))
+    db.add_all(log_rows)
+    await bump_rollups(db, rollup_changes)
+    await db.commit()
+    return results
+
+async def ingest_events(db, events):
+    # Applies events oldest first and returns results in request order
+    order = sorted(range(len(events)), key=lambda i: _utc_naive(events[i].timestamp))
+    results = [None] * len(events)
+    for offset in range(0, len(order), INGEST_CHUNK_SIZE):
+        indexes = order[offset:offset + INGEST_CHUNK_SIZE]
+        chunk = [events[i] for i in indexes]
+        try:
+            chunk_results = await _apply_chunk(db, chunk)
+        except IntegrityError:
+            # Another upload claimed some of these keys (or a start) concurrently;
+            # retry once so they resolve as duplicates/rejections
+            await db.rollback()
+            chunk_results = await _apply_chunk(db, chunk)
+        for i, result in zip(indexes, chunk_results):
+            results[i] = result
+    return results
+
+def applied_feed_events(events, results):
+    # Live-board events for the punches ingest_events applied
+    feed = []
+    for event, result in zip(events, results):
+        if result["status"] == "applied":
+            timestamp = _utc_naive(event.timestamp)
+            feed.append(attendance_event(
+                event.type, event.employee_id, timestamp.date(), result["attendance_id"],
+                break_id=result["break_id"], **{FEED_FIELDS[event.type]: timestamp},
+            ))
+    return feed
@@ -3,19 +3,37 @@ from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.database import get_db
+from core.database import get_async_db, get_db, get_read_db, async_session_scope
 from models.user import User
 
+import logging
 import os
 from dotenv import load_dotenv
 load_dotenv()
+logger = logging.getLogger(__name__)
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# "db" looks the user up on every request, "stateless" trusts the signed claims;
+# handlers that need other columns load the row themselves. Revocations below
+# are per process, so in stateless mode tokens carrying a privileged role are
+# still checked against the users row; a demoted or deleted admin is refused
+# on every worker. Plain user tokens stay valid until they expire.
+AUTH_MODE = os.getenv("AUTH_MODE", "db")
+# Roles whose tokens are always verified against the database
+VERIFIED_ROLES = ("admin", "kiosk")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Revocation filter: user id -> lowest token version still accepted.
+# A value of None means every token for that user is revoked (user deleted).
+# This is per process; tokens expire after ACCESS_TOKEN_EXPIRE_MINUTES anyway.
+_revoked_versions = {}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -26,28 +44,107 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def token_claims(user: User) -> dict:
+    # Claims needed to authorize a request without reading the users table
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role,
+        "name": user.name,
+        "ver": user.token_version or 0,
+    }
+
+def revoke_user_tokens(user_id: int, min_version: Optional[int] = None):
+    # Reject tokens for user_id older than min_version (all tokens when None)
+    _revoked_versions[user_id] = min_version
+
+def is_token_revoked(user_id: int, version: int) -> bool:
+    if user_id not in _revoked_versions:
+        return False
+    min_version = _revoked_versions[user_id]
+    return min_version is None or version < min_version
+
+class TokenUser:
+    # Authenticated user built from verified token claims. Only carries what the
+    # token does; use db.get(User, current_user.id) for anything else.
+
+    def __init__(self, claims: dict):
+        self.id = claims["uid"]
+        self.email = claims["sub"]
+        self.role = claims.get("role", "user")
+        self.name = claims.get("name")
+        self.token_version = claims["ver"]
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _verified_claims(token: str) -> dict:
+    # Decoded claims of a valid, unrevoked token
     try:
-        print("Decoding token...")
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")  # Getting the 'sub' (subject) field which is the email or ID
-        print(f"Decoded token: {payload}")
-        print(f"Username: {username}")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    except Exception as e:
-        print(f"Error decoding token: {e}")
-        raise credentials_exception
-
-    # Query the user from the database using the username (which is the email)
-    user = db.query(User).filter(User.email == username).first()
+    except JWTError as e:
+        logger.debug("Rejected token: %s", e)
+        raise _credentials_exception()
+    except Exception:
+        logger.exception("Unexpected error decoding token")
+        raise _credentials_exception()
+    # 'sub' is the user's email
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    user_id = payload.get("uid")
+    version = payload.get("ver")
+    if user_id is not None and version is not None and is_token_revoked(user_id, version):
+        raise _credentials_exception()
+    return payload
+
+def _token_user(payload: dict) -> Optional[TokenUser]:
+    # The user from the claims alone, when no database check is needed
+    if AUTH_MODE != "stateless" or payload.get("role") in VERIFIED_ROLES:
+        return None
+    if payload.get("uid") is None or payload.get("ver") is None:
+        return None  # issued before tokens carried these claims
+    return TokenUser(payload)
+
+def _user_query(payload: dict):
+    return select(User).where(User.email == payload["sub"])
+
+def _checked_user(user, payload: dict):
+    version = payload.get("ver")
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    if version is not None and version != (user.token_version or 0):
+        raise _credentials_exception()
     return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    payload = _verified_claims(token)
+    user = _token_user(payload)
+    if user is not None:
+        return user
+    return _checked_user((await db.execute(_user_query(payload))).scalars().first(), payload)
+
+def get_current_user_sync(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # get_current_user for sync handlers: shares the handler's get_db session, so
+    # a request checks out one pooled connection instead of two
+    payload = _verified_claims(token)
+    user = _token_user(payload)
+    if user is not None:
+        return user
+    return _checked_user(db.execute(_user_query(payload)).scalars().first(), payload)
+
+def get_current_user_read(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
+    # get_current_user_sync for GET reporting handlers on get_read_db. With a
+    # replica configured the version check may lag the primary slightly; the
+    # in-process revocation filter still applies.
+    return get_current_user_sync(token, db)
+
+async def get_current_user_unpinned(token: str = Depends(oauth2_scheme)):
+    # get_current_user for long-lived responses such as SSE streams. FastAPI keeps
+    # yield dependencies (and so get_async_db's connection) open until the
+    # response ends; this looks the user up in a session closed before returning.
+    async with async_session_scope() as db:
+        return await get_current_user(token, db)
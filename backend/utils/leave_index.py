@@ -0,0 +1,161 @@
+# In-memory interval index over approved and pending leave. Loaded in the
+# background once the worker is serving, updated by the leave routes after each
+# commit and periodically rebuilt from the database so changes made by other
+# workers are picked up.
+import asyncio
+import bisect
+import logging
+import os
+from datetime import timedelta
+from sqlalchemy import select
+from models.leave import LeaveRequest, LeaveStatus
+
+LEAVE_INDEX_REFRESH_SECONDS = int(os.getenv("LEAVE_INDEX_REFRESH_SECONDS", "60"))
+INDEXED_STATUSES = (LeaveStatus.APPROVED, LeaveStatus.PENDING)
+logger = logging.getLogger(__name__)
+
+class IntervalList:
+    # Intervals sorted by start date. Every interval is at most max_len long, so
+    # the ones touching [a, b] all start within [a - max_len, b]: two bisects
+    # bound the scan to the matching intervals.
+
+    def __init__(self):
+        self.items = []  # (start, end, leave_id, employee_id, leave_type)
+        self.max_len = timedelta(0)
+
+    def add(self, item):
+        bisect.insort(self.items, item)
+        self.max_len = max(self.max_len, item[1] - item[0])
+
+    def remove(self, item):
+        i = bisect.bisect_left(self.items, item)
+        if i < len(self.items) and self.items[i] == item:
+            del self.items[i]
+
+    def overlapping(self, start, end):
+        lo = bisect.bisect_left(self.items, (start - self.max_len,))
+        hi = bisect.bisect_right(self.items, (end, end + timedelta(days=36500)))
+        return [item for item in self.items[lo:hi] if item[1] >= start]
+
+def _out_entry(item, status):
+    start, end, leave_id, employee_id, leave_type = item
+    return {
+        "leave_id": leave_id,
+        "employee_id": employee_id,
+        "leave_type": leave_type.value,
+        "start_date": start,
+        "end_date": end,
+        "status": status.value,
+    }
+
+async def query_out_between(db, start, end, statuses=(LeaveStatus.APPROVED,)):
+    # out_between() answered with SQL, for requests served before the index is loaded
+    rows = (await db.execute(select(
+        LeaveRequest.start_date, LeaveRequest.end_date, LeaveRequest.id,
+        LeaveRequest.employee_id, LeaveRequest.leave_type, LeaveRequest.status,
+    ).where(
+        LeaveRequest.status.in_(statuses),
+        LeaveRequest.end_date >= start,
+        LeaveRequest.start_date <= end,
+    ).order_by(LeaveRequest.start_date, LeaveRequest.end_date, LeaveRequest.id))).all()
+    return [_out_entry(row[:5], status) for status in statuses for row in rows if row[5] == status]
+
+class LeaveIntervalIndex:
+
+    def __init__(self):
+        self.ready = False
+        self._reset()
+        self._replay = None
+        self._task = None
+        self._rebuild_lock = asyncio.Lock()
+
+    def _reset(self):
+        self._items = {}  # leave_id -> (status, item)
+        self._all = {status: IntervalList() for status in INDEXED_STATUSES}
+        self._by_employee = {}  # (employee_id, status) -> IntervalList
+
+    def _insert(self, leave_id, employee_id, leave_type, start, end, status):
+        self._delete(leave_id)
+        if status not in INDEXED_STATUSES:
+            return
+        item = (start, end, leave_id, employee_id, leave_type)
+        self._items[leave_id] = (status, item)
+        self._all[status].add(item)
+        self._by_employee.setdefault((employee_id, status), IntervalList()).add(item)
+
+    def _delete(self, leave_id):
+        entry = self._items.pop(leave_id, None)
+        if entry is not None:
+            status, item = entry
+            self._all[status].remove(item)
+            self._by_employee[(item[3], status)].remove(item)
+
+    def put(self, leave, status=None):
+        # Record a leave's status (its own unless given); rejected leave drops out of the index
+        args = (leave.id, leave.employee_id, leave.leave_type, leave.start_date, leave.end_date, status or leave.status)
+        if self._replay is not None:
+            self._replay.append(args)
+        self._insert(*args)
+
+    def discard(self, leave_id):
+        # Drop a deleted leave; recorded like put() so a running rebuild doesn't bring it back
+        args = (leave_id, None, None, None, None, None)
+        if self._replay is not None:
+            self._replay.append(args)
+        self._insert(*args)
+
+    def overlaps(self, employee_id, start, end, statuses=(LeaveStatus.APPROVED,)):
+        return any(
+            self._by_employee.get((employee_id, status), IntervalList()).overlapping(start, end)
+            for status in statuses
+        )
+
+    def out_between(self, start, end, statuses=(LeaveStatus.APPROVED,)):
+        # Who is out at some point in [start, end]
+        return [
+            _out_entry(item, status)
+            for status in statuses
+            for item in self._all[status].overlapping(start, end)
+        ]
+
+    async def rebuild(self, db):
+        # Load a fresh snapshot, then reapply changes made while the query ran
+        async with self._rebuild_lock:
+            self._replay = []
+            try:
+                rows = (await db.execute(select(
+                    LeaveRequest.id, LeaveRequest.employee_id, LeaveRequest.leave_type,
+                    LeaveRequest.start_date, LeaveRequest.end_date, LeaveRequest.status,
+                ).where(LeaveRequest.status.in_(INDEXED_STATUSES)))).all()
+                replay = self._replay
+            finally:
+                self._replay = None
+            self._reset()
+            for row in rows:
+                self._insert(*row)
+            for args in replay:
+                self._insert(*args)
+            self.ready = True
+
+    async def _refresh_loop(self, session_factory):
+        # The first load runs right away, after the worker is already serving
+        while True:
+            try:
+                async with session_factory() as db:
+                    await self.rebuild(db)
+            except Exception:
+                # Keep serving the last snapshot (or SQL before the first one); the next cycle retries
+                logger.exception("Leave index refresh failed")
+            await asyncio.sleep(LEAVE_INDEX_REFRESH_SECONDS)
+
+    def start(self, session_factory):
+        # session_factory is an async context manager yielding an AsyncSession-like db
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop(session_factory))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+leave_index = LeaveIntervalIndex()
@@ -0,0 +1,168 @@
+# Approve/reject many leave requests in one transaction. Leave rows and the
+# affected users are locked with SELECT ... FOR UPDATE, balances are deducted
+# with one set-based UPDATE per balance column, and every deduction is written
+# to the append-only leave balance ledger. Accounts start with "grant" credits
+# (or a backfilled "opening" credit), so each employee's deltas per leave type
+# sum to the matching balance column.
+from datetime import datetime
+from sqlalchemy import select, update, case, func
+from models.leave import LeaveRequest, LeaveType, LeaveStatus
+from models.leave_ledger import LeaveBalanceLedger
+from models.user import User
+from core.response_cache import response_cache
+from utils.analytics import invalidate_months
+from utils.leave_index import leave_index
+
+BALANCE_COLUMNS = {
+    LeaveType.CASUAL: "casual_leave_balance",
+    LeaveType.SICK: "sick_leave_balance",
+    LeaveType.WFH: "wfh_balance",
+}
+INSUFFICIENT_DETAIL = {
+    LeaveType.CASUAL: "Insufficient casual leave balance",
+    LeaveType.SICK: "Insufficient sick leave balance",
+    LeaveType.WFH: "Insufficient WFH balance",
+}
+# Ledger reasons that establish a starting balance
+GRANT_REASONS = ("opening", "grant")
+NOT_FOUND_DETAIL = "Leave request not found"
+PROCESSED_DETAIL = "Leave already processed"
+
+def leave_days(leave) -> int:
+    return (leave.end_date - leave.start_date).days + 1
+
+def balance_grants(user, reason: str = "grant", created_by=None):
+    # Ledger credits for a user's current balances, one per leave type (zero
+    # included). Call after the user row is flushed so id and defaults are set.
+    now = datetime.utcnow()
+    return [
+        LeaveBalanceLedger(
+            employee_id=user.id,
+            leave_type=leave_type,
+            delta=getattr(user, column) or 0,
+            balance_after=getattr(user, column) or 0,
+            reason=reason,
+            created_by=created_by,
+            created_at=now,
+        )
+        for leave_type, column in BALANCE_COLUMNS.items()
+    ]
+
+def seed_opening_balances(db) -> int:
+    # Backfill for accounts created before grants were recorded: an "opening"
+    # credit per leave type equal to the balance plus what the ledger already
+    # deducted. db is a blocking Session; returns the number of users seeded.
+    seeded = select(LeaveBalanceLedger.employee_id).where(LeaveBalanceLedger.reason.in_(GRANT_REASONS))
+    users = db.execute(select(User).where(User.id.not_in(seeded)).order_by(User.id)).scalars().all()
+    if not users:
+        return 0
+    recorded = {
+        (employee_id, leave_type): total
+        for employee_id, leave_type, total in db.execute(select(
+            LeaveBalanceLedger.employee_id, LeaveBalanceLedger.leave_type, func.sum(LeaveBalanceLedger.delta),
+        ).where(LeaveBalanceLedger.employee_id.in_([u.id for u in users])).group_by(
+            LeaveBalanceLedger.employee_id, LeaveBalanceLedger.leave_type,
+        ))
+    }
+    now = datetime.utcnow()
+    for user in users:
+        for leave_type, column in BALANCE_COLUMNS.items():
+            opening = (getattr(user, column) or 0) - recorded.get((user.id, leave_type), 0)
+            db.add(LeaveBalanceLedger(
+                employee_id=user.id,
+                leave_type=leave_type,
+                delta=opening,
+                balance_after=opening,
+                reason="opening",
+                created_at=now,
+            ))
+    db.commit()
+    return len(users)
+
+async def review_leaves(db, ids, action: str, reviewer_id: int):
+    # Returns ({leave_id: (status, detail)}, [reviewed LeaveRequest]) and commits
+    ids = list(dict.fromkeys(ids))
+    outcomes = {}
+    leaves = (await db.execute(
+        select(LeaveRequest).where(LeaveRequest.id.in_(ids)).order_by(LeaveRequest.id).with_for_update()
+    )).scalars().all()
+    found = {leave.id for leave in leaves}
+    for leave_id in ids:
+        if leave_id not in found:
+            outcomes[leave_id] = ("failed", NOT_FOUND_DETAIL)
+    pending = []
+    for leave in leaves:
+        if leave.status != LeaveStatus.PENDING:
+            outcomes[leave.id] = ("failed", PROCESSED_DETAIL)
+        else:
+            pending.append(leave)
+
+    now = datetime.utcnow()
+    reviewed = []
+    if action == "reject":
+        for leave in pending:
+            outcomes[leave.id] = ("rejected", None)
+            reviewed.append(leave)
+        new_status = LeaveStatus.REJECTED
+    else:
+        # Lock users in id order so concurrent reviews cannot deadlock
+        user_ids = sorted({leave.employee_id for leave in pending})
+        balances = {}
+        if user_ids:
+            rows = await db.execute(
+                select(User.id, *(getattr(User, c) for c in BALANCE_COLUMNS.values()))
+                .where(User.id.in_(user_ids)).order_by(User.id).with_for_update()
+            )
+            for row in rows:
+                balances[row[0]] = dict(zip(BALANCE_COLUMNS.values(), row[1:]))
+
+        deductions = {c: {} for c in BALANCE_COLUMNS.values()}
+        ledger = []
+        # Oldest requests get first claim on the balance
+        for leave in sorted(pending, key=lambda l: (l.applied_at or now, l.id)):
+            column = BALANCE_COLUMNS[leave.leave_type]
+            days = leave_days(leave)
+            balance = balances[leave.employee_id]
+            if balance[column] < days:
+                outcomes[leave.id] = ("failed", INSUFFICIENT_DETAIL[leave.leave_type])
+                continue
+            balance[column] -= days
+            deductions[column][leave.employee_id] = deductions[column].get(leave.employee_id, 0) + days
+            ledger.append(LeaveBalanceLedger(
+                employee_id=leave.employee_id,
+                leave_type=leave.leave_type,
+                delta=-days,
+                balance_after=balance[column],
+                leave_request_id=leave.id,
+                reason="approval",
+                created_by=reviewer_id,
+                created_at=now,
+            ))
+            outcomes[leave.id] = ("approved", None)
+            reviewed.append(leave)
+
+        for column, per_user in deductions.items():
+            if per_user:
+                await db.execute(
+                    update(User).where(User.id.in_(list(per_user)))
+                    .values({column: getattr(User, column) - case(per_user, value=User.id)})
+                    .execution_options(synchronize_session=False)
+                )
+        db.add_all(ledger)
+        new_status = LeaveStatus.APPROVED
+
+    if reviewed:
+        await db.execute(
+            update(LeaveRequest).where(LeaveRequest.id.in_([leave.id for leave in reviewed]))
+            .values(status=new_status, reviewed_at=now, reviewed_by=reviewer_id)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    for leave in reviewed:
+        leave_index.put(leave, new_status)
+    # Calendars and balances of the affected employees changed
+    response_cache.invalidate_users(leave.employee_id for leave in reviewed)
+    if new_status == LeaveStatus.APPROVED:
+        for leave in reviewed:
+            invalidate_months(leave.start_date, leave.end_date)
+    return outcomes, reviewed
@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(*values) -> str:
+    # Opaque cursor holding the sort key of the last row on a page
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types) -> list:
+    # Decodes a cursor back into its key values, converting each with the matching type
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(types):
+            raise ValueError("cursor length mismatch")
+        return [datetime.fromisoformat(v) if t is datetime else t(v) for v, t in zip(values, types)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def page_size(limit, cursor):
+    # Every list is paged: without a limit the page holds DEFAULT_PAGE_SIZE rows
+    # (routes cap limit at MAX_PAGE_SIZE); clients follow X-Next-Cursor for more
+    return limit or DEFAULT_PAGE_SIZE
+
+def limit_page(query, limit):
+    # Fetch one row past the page so paginate() can tell whether another page follows
+    return query.limit(limit + 1)
+
+def paginate(rows: list, limit, response: Response, key) -> list:
+    # rows is fetched with limit_page(); the extra row only signals there is another page.
+    # The next cursor goes in a header so list endpoints keep returning plain arrays.
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
+    return rows
@@ -0,0 +1,120 @@
+# Per-employee attendance rollups, kept current by the attendance routes and
+# rebuilt from history with: python -m utils.rollups
+from sqlalchemy import select, delete
+from core.database import SessionLocal, dialect_insert
+from models.rollup import AttendanceRollup
+
+LIFETIME = 0
+COUNTERS = ("total_days", "present_days", "leave_days", "worked_seconds", "break_seconds")
+
+def span_seconds(start, end) -> int:
+    if start is None or end is None:
+        return 0
+    return int((end - start).total_seconds())
+
+def rollup_upsert(db, employee_id: int, day, **deltas):
+    # One statement that adds deltas to the month row and the lifetime row
+    rows = []
+    for year, month in ((day.year, day.month), (LIFETIME, LIFETIME)):
+        row = {c: 0 for c in COUNTERS}
+        row.update(deltas)
+        row.update(employee_id=employee_id, year=year, month=month)
+        rows.append(row)
+    stmt = dialect_insert(db, AttendanceRollup).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["employee_id", "year", "month"],
+        set_={c: getattr(AttendanceRollup, c) + stmt.excluded[c] for c in deltas},
+    )
+
+def accumulate_rollup_changes(rows: dict, changes) -> dict:
+    # Adds (employee_id, day, deltas) changes into rows, keyed by (employee_id, year, month);
+    # changes may be a lazy iterable, so memory follows the number of keys, not of changes
+    for employee_id, day, deltas in changes:
+        for key in ((employee_id, day.year, day.month), (employee_id, LIFETIME, LIFETIME)):
+            row = rows.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for c, v in deltas.items():
+                row[c] += v
+    return rows
+
+def merge_rollup_changes(changes):
+    # Sums (employee_id, day, deltas) changes into one row per rollup key, so a
+    # single multi-row upsert never touches the same row twice
+    rows = accumulate_rollup_changes({}, changes)
+    return [{"employee_id": e, "year": y, "month": m, **counters} for (e, y, m), counters in rows.items()]
+
+async def bump_rollups(db, changes):
+    # Applies many rollup changes with one statement in the caller's transaction
+    rows = merge_rollup_changes(changes)
+    if rows:
+        stmt = dialect_insert(db, AttendanceRollup).values(rows)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=["employee_id", "year", "month"],
+            set_={c: getattr(AttendanceRollup, c) + stmt.excluded[c] for c in COUNTERS},
+        ))
+
+async def bump_rollup(db, employee_id: int, day, **deltas):
+    # Runs in the caller's transaction so the rollup commits with the attendance change
+    deltas = {c: v for c, v in deltas.items() if v}
+    if deltas:
+        await db.execute(rollup_upsert(db, employee_id, day, **deltas))
+
+async def get_rollup(db, employee_id: int, year: int = LIFETIME, month: int = LIFETIME):
+    return await db.get(AttendanceRollup, (employee_id, year, month))
+
+def rebuild_rollups(db):
+    # Recomputes every rollup row from attendance and breaks history, both tiers.
+    # Rows are streamed and summed per rollup key as they arrive.
+    from models.attendance import Attendance
+    from models.breaks import Break
+
+    totals = {}
+    attendance = db.execute(select(
+        Attendance.employee_id, Attendance.date, Attendance.start_time,
+        Attendance.end_time, Attendance.work_summary,
+    ).execution_options(yield_per=5000))
+    accumulate_rollup_changes(totals, (
+        (employee_id, day, {
+            "total_days": 1,
+            "present_days": 1 if start is not None else 0,
+            "leave_days": 1 if summary == "LEAVE" else 0,
+            "worked_seconds": span_seconds(start, end),
+        })
+        for employee_id, day, start, end, summary in attendance
+    ))
+
+    breaks = db.execute(select(Attendance.employee_id, Attendance.date, Break.break_in, Break.break_out).join(
+        Attendance, Attendance.id == Break.attendance_id,
+    ).where(Break.break_out.isnot(None)).execution_options(yield_per=5000))
+    accumulate_rollup_changes(totals, (
+        (employee_id, day, {"break_seconds": span_seconds(break_in, break_out)})
+        for employee_id, day, break_in, break_out in breaks
+    ))
+
+    # Archived months are no longer in the hot tables; read one month at a time
+    from utils.archive import read_archived_days
+    from models.archive import ArchivedMonth
+    for entry in db.execute(select(ArchivedMonth)).scalars().all():
+        accumulate_rollup_changes(totals, (
+            (row["employee_id"], row["date"], {
+                "total_days": 1,
+                "present_days": 1 if row["start_time"] is not None else 0,
+                "leave_days": 1 if row["work_summary"] == "LEAVE" else 0,
+                "worked_seconds": span_seconds(row["start_time"], row["end_time"]),
+                "break_seconds": sum(span_seconds(b["break_in"], b["break_out"]) for b in row["breaks"]),
+            })
+            for row in read_archived_days(entry.path)
+        ))
+
+    rows = [{"employee_id": e, "year": y, "month": m, **counters} for (e, y, m), counters in totals.items()]
+    db.execute(delete(AttendanceRollup))
+    db.bulk_insert_mappings(AttendanceRollup, rows)
+    db.commit()
+    return len(rows)
+
+if __name__ == "__main__":
+    import models  # noqa: F401  (register all mappers)
+    session = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_rollups(session)} rollup rows")
+    finally:
+        session.close()
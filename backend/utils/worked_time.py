@@ -0,0 +1,101 @@
+# Net worked time per attendance: the day's span minus its breaks, computed
+# with one SQL aggregate over breaks grouped by attendance.
+#
+# Rules:
+# - A closed day is end_time - start_time minus its breaks.
+# - Today's open day runs until now.
+# - An unclosed past day is "incomplete" and counts as zero worked time.
+# - An open break ends at the day's end_time, or at now while the day is still open.
+#
+# Archived months (utils.archive) are computed in Python from the cold tier.
+from datetime import datetime
+from sqlalchemy import select, func, case, extract, literal
+from starlette.concurrency import run_in_threadpool
+from models.attendance import Attendance
+from models.breaks import Break
+from utils.archive import archived_months_query, months_between, read_archived_days
+
+def seconds_between(dialect_name: str, start, end):
+    # Elapsed seconds between two timestamp expressions on Postgres or SQLite
+    if dialect_name == "postgresql":
+        return extract("epoch", end - start)
+    return (func.julianday(end) - func.julianday(start)) * 86400
+
+def worked_time_query(dialect_name: str, start, end, now: datetime, employee_id=None):
+    break_end = func.coalesce(Break.break_out, Attendance.end_time, literal(now))
+    query = select(
+        Attendance.id,
+        Attendance.employee_id,
+        Attendance.date,
+        Attendance.start_time,
+        Attendance.end_time,
+        func.coalesce(func.sum(case(
+            (Break.id.isnot(None), seconds_between(dialect_name, Break.break_in, break_end)),
+            else_=0,
+        )), 0).label("break_seconds"),
+    ).outerjoin(Break, Break.attendance_id == Attendance.id).where(
+        Attendance.date >= start,
+        Attendance.date <= end,
+    ).group_by(
+        Attendance.id, Attendance.employee_id, Attendance.date, Attendance.start_time, Attendance.end_time,
+    ).order_by(Attendance.employee_id, Attendance.date)
+    if employee_id is not None:
+        query = query.where(Attendance.employee_id == employee_id)
+    return query
+
+def _day_entry(attendance_id, emp_id, day, start_time, end_time, break_seconds, now: datetime):
+    if start_time is None:
+        status, span = "absent", 0
+    elif end_time is not None:
+        status, span = "closed", (end_time - start_time).total_seconds()
+    elif day == now.date():
+        status, span = "open", (now - start_time).total_seconds()
+    else:
+        status, span = "incomplete", 0
+    break_seconds = float(break_seconds or 0) if span else 0
+    return {
+        "attendance_id": attendance_id,
+        "employee_id": emp_id,
+        "date": day,
+        "status": status,
+        "span_minutes": int(span // 60),
+        "break_minutes": int(break_seconds // 60),
+        "worked_minutes": int(max(span - break_seconds, 0) // 60),
+    }
+
+def _archived_days(path, start, end, employee_id, now: datetime):
+    days = []
+    for row in read_archived_days(path, employee_id):
+        if not start <= row["date"] <= end:
+            continue
+        break_seconds = sum(
+            ((b["break_out"] or row["end_time"] or now) - b["break_in"]).total_seconds() for b in row["breaks"]
+        )
+        days.append(_day_entry(row["id"], row["employee_id"], row["date"], row["start_time"],
+                               row["end_time"], break_seconds, now))
+    return days
+
+async def worked_time(db, start, end, employee_id=None, now: datetime = None):
+    # One dict per attendance row in [start, end], ordered by employee and date
+    now = now or datetime.utcnow()
+    query = worked_time_query(db.get_bind().dialect.name, start, end, now, employee_id)
+    days = [_day_entry(*row, now) for row in (await db.execute(query)).all()]
+    archived = (await db.execute(archived_months_query(months_between(start, end)))).scalars().all()
+    for entry in archived:
+        days.extend(await run_in_threadpool(_archived_days, entry.path, start, end, employee_id, now))
+    if archived:
+        days.sort(key=lambda d: (d["employee_id"], d["date"]))
+    return days
+
+def totals_by_employee(days):
+    totals = {}
+    for d in days:
+        t = totals.setdefault(d["employee_id"], {
+            "employee_id": d["employee_id"], "days": 0, "incomplete_days": 0,
+            "worked_minutes": 0, "break_minutes": 0,
+        })
+        t["days"] += 1
+        t["incomplete_days"] += d["status"] == "incomplete"
+        t["worked_minutes"] += d["worked_minutes"]
+        t["break_minutes"] += d["break_minutes"]
+    return list(totals.values())
@@ -3,7 +3,7 @@ import { useEffect, useState } from "react"
 import type React from "react"
 import { useRouter } from "next/navigation"
 
-import { api, setAuthToken } from "../utils/api"
+import { api, getAllPages, setAuthToken } from "../utils/api"
 import {
   Users,
   Plus,
@@ -51,8 +51,7 @@ export default function AdminPage() {
     setLoading(true)
     setFeedback("")
     try {
-      const res = await api.get("/admin/users")
-      setUsers(res.data)
+      setUsers(await getAllPages<User>("/admin/users"))
     } catch {
       setAuthError("Access denied: Admins only.")
     } finally {
@@ -64,8 +63,7 @@ export default function AdminPage() {
     setLoading(true)
     setFeedback("")
     try {
-      const res = await api.get("/admin/users")
-      setUsers(res.data)
+      setUsers(await getAllPages<User>("/admin/users"))
       setFeedbackType("success")
     } catch {
       setFeedback("Failed to fetch users")
@@ -1,6 +1,6 @@
 "use client"
 import { useEffect, useState } from "react"
-import { api, setAuthToken } from "../../utils/api"
+import { api, getAllPages, setAuthToken } from "../../utils/api"
 import { CheckCircle, XCircle, Calendar, Clock, FileText, User } from "lucide-react"
 
 interface LeaveRequest {
@@ -39,8 +39,7 @@ export default function AdminLeavePage() {
     setLoading(true)
     setFeedback("")
     try {
-      const res = await api.get("/leave/pending")
-      setPendingRequests(res.data)
+      setPendingRequests(await getAllPages<LeaveRequest>("/leave/pending"))
     } catch {
       setFeedback("Failed to fetch pending requests")
       setFeedbackType("error")
@@ -2,7 +2,7 @@
 import { useEffect, useState } from "react"
 import type React from "react"
 
-import { api, setAuthToken } from "../utils/api"
+import { api, getAllPages, setAuthToken } from "../utils/api"
 import { Calendar, Clock, Home, AlertCircle, ChevronRight } from "lucide-react"
 
 interface LeaveRequest {
@@ -47,8 +47,7 @@ export default function LeavePage() {
 
   const fetchLeaveRequests = async () => {
     try {
-      const res = await api.get("/leave/my-requests")
-      setLeaveRequests(res.data)
+      setLeaveRequests(await getAllPages<LeaveRequest>("/leave/my-requests"))
     } catch {
       setFeedback("Failed to fetch leave requests")
     }
@@ -14,4 +14,17 @@ export function setAuthToken(token: string) {
   api.defaults.headers.common['Authorization'] = `Bearer ${token}`;
 }
 
+// List endpoints return one page at a time; the next page's cursor comes back
+// in the X-Next-Cursor header. Fetches every page and returns the combined list.
+export async function getAllPages<T>(url: string): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | undefined;
+  do {
+    const res = await api.get<T[]>(url, { params: cursor ? { cursor } : undefined });
+    items.push(...res.data);
+    cursor = res.headers['x-next-cursor'];
+  } while (cursor);
+  return items;
+}
+
 export default api;